@@ -0,0 +1 @@
+""" performance benchmark, see __main__.py """
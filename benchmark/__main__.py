@@ -0,0 +1,49 @@
+"""
+performance benchmark of findit. run it in the root dir of this repo:
+
+    # all the cases
+    python -m benchmark --output result.json
+    # some of them, and compare with a saved result
+    python -m benchmark --case 'find.1080p.*' --baseline result.json
+"""
+import argparse
+import sys
+
+from benchmark import runner
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "-c", "--case", action="append", help="case name pattern, eg: 'find.*'"
+    )
+    parser.add_argument("-r", "--repeat", type=int, help="measured runs of each case")
+    parser.add_argument("-w", "--warmup", type=int, help="unmeasured runs of each case")
+    parser.add_argument("-o", "--output", help="save result to this json file")
+    parser.add_argument("-b", "--baseline", help="compare with this saved result")
+    parser.add_argument(
+        "-t",
+        "--tolerance",
+        type=float,
+        default=0.2,
+        help="slower (or larger) than baseline * (1 + tolerance) is a regression",
+    )
+    args = parser.parse_args()
+
+    result = runner.run(args.case, args.repeat, args.warmup)
+    if args.output:
+        runner.dump(result, args.output)
+
+    if args.baseline:
+        regression_list = runner.compare(
+            result, runner.load(args.baseline), args.tolerance
+        )
+        for each in regression_list:
+            print(f"REGRESSION {each}")
+        if regression_list:
+            sys.exit(1)
+        print("no regression")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+"""
+benchmark cases.
+
+each case is a setup function, which prepares everything and returns (run, teardown).
+only run is measured. run returns True if its result is correct.
+"""
+import collections
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import typing
+
+import cv2
+
+from benchmark import screen as screen_mod
+
+_RunFunc = typing.Callable[[], bool]
+_SetupResult = typing.Tuple[_RunFunc, typing.Optional[typing.Callable[[], None]]]
+
+Case = collections.namedtuple("Case", ("name", "setup"))
+
+# name -> engine_template_scale
+SCALE_DICT = {
+    "scale1": (1, 1, 1),
+    "scale10": (1, 3, 10),
+}
+TEMPLATE_NUM_LIST = (1, 4)
+# engine_template_compress_rate, 0.5 and lower allow reduced decoding
+JPEG_COMPRESS_RATE_LIST = (1.0, 0.5, 0.25)
+# result is correct if target point is not farther than this (in pixels)
+POINT_TOLERANCE = 5
+
+
+def _is_close(point: typing.Sequence, expected: typing.Sequence) -> bool:
+    return all(abs(a - b) <= POINT_TOLERANCE for a, b in zip(point, expected))
+
+
+def _load_sample() -> typing.Tuple:
+    target = cv2.imread(os.path.join(screen_mod.PIC_DIR_PATH, screen_mod.TARGET_NAME))
+    template_list = screen_mod.load_sample_templates(2)
+    return target, template_list
+
+
+# engines
+def _setup_engine(engine_name: str) -> _SetupResult:
+    from findit import toolbox
+    from findit.engine import engine_dict
+
+    engine = engine_dict[engine_name]()
+    target, template_list = _load_sample()
+    target = toolbox.load_grey_from_cv2_object(target)
+    # app store logo, which has enough feature points
+    template = toolbox.load_grey_from_cv2_object(template_list[1][1])
+    if engine_name == "sim":
+        # compare with a part of itself
+        template = target[: target.shape[0] // 2]
+
+    def _run() -> bool:
+        # a new target each time, like a new screenshot
+        # or things derived from it (eg: features) will be reused
+        return bool(engine.execute(template, target.copy())["ok"])
+
+    return _run, None
+
+
+# end to end
+def _setup_find_sample() -> _SetupResult:
+    from findit import FindIt
+
+    target, template_list = _load_sample()
+    fi = FindIt(engine=["template", "feature"])
+    for name, template in template_list:
+        fi.load_template(name, pic_object=template)
+
+    def _run() -> bool:
+        result = fi.find("screen", target_pic_object=target)
+        return all(each["TemplateEngine"]["ok"] for each in result["data"].values())
+
+    return _run, None
+
+
+def _setup_find_screen(
+    resolution: str, template_num: int, scale_name: str
+) -> _SetupResult:
+    from findit import FindIt
+
+    template_list = screen_mod.load_sample_templates(template_num)
+    target, point_dict = screen_mod.build_screen(resolution, template_list)
+    fi = FindIt(engine=["template"], engine_template_scale=SCALE_DICT[scale_name])
+    for name, template in template_list:
+        fi.load_template(name, pic_object=template)
+
+    def _run() -> bool:
+        result = fi.find("screen", target_pic_object=target)
+        return all(
+            _is_close(each["TemplateEngine"]["target_point"], point_dict[name])
+            for name, each in result["data"].items()
+        )
+
+    return _run, None
+
+
+def _setup_find_jpeg(compress_rate: float) -> _SetupResult:
+    """ 4k jpeg capture (encoded), compressed by engine """
+    from findit import FindIt
+
+    template_list = screen_mod.load_sample_templates(1)
+    # templates look the same as the originals after compression
+    target, point_dict = screen_mod.build_screen(
+        "4k", template_list, template_scale=1 / compress_rate
+    )
+    target_bytes = cv2.imencode(".jpg", target)[1].tobytes()
+    fi = FindIt(
+        engine=["template"],
+        engine_template_scale=(1, 1, 1),
+        engine_template_compress_rate=compress_rate,
+    )
+    for name, template in template_list:
+        fi.load_template(name, pic_object=template)
+
+    def _run() -> bool:
+        result = fi.find("screen", target_pic_object=target_bytes)
+        return all(
+            _is_close(each["TemplateEngine"]["target_point"], point_dict[name])
+            for name, each in result["data"].items()
+        )
+
+    return _run, None
+
+
+# http
+def _get_free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _setup_http() -> _SetupResult:
+    import requests
+
+    port = _get_free_port()
+    url = f"http://127.0.0.1:{port}"
+    server_process = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "findit.server",
+            "--dir",
+            screen_mod.PIC_DIR_PATH,
+            "--port",
+            str(port),
+        ],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+    # wait for server
+    for _ in range(100):
+        try:
+            requests.get(url)
+            break
+        except requests.exceptions.ConnectionError:
+            time.sleep(0.1)
+
+    target_path = os.path.join(screen_mod.PIC_DIR_PATH, screen_mod.TARGET_NAME)
+    with open(target_path, "rb") as f:
+        target_bytes = f.read()
+    form = {
+        "template_name": ",".join(screen_mod.TEMPLATE_NAME_LIST[:2]),
+        "extras": json.dumps({"engine": ["template"]}),
+    }
+
+    def _run() -> bool:
+        resp = requests.post(f"{url}/analyse", data=form, files={"file": target_bytes})
+        return resp.ok and resp.json()["status"] == "OK"
+
+    def _teardown():
+        server_process.terminate()
+        server_process.wait()
+
+    return _run, _teardown
+
+
+def _bind(func: typing.Callable, *args) -> typing.Callable[[], _SetupResult]:
+    return lambda: func(*args)
+
+
+def get_case_list() -> typing.List[Case]:
+    case_list = [
+        Case(f"engine.{each}", _bind(_setup_engine, each))
+        for each in ("template", "feature", "sim", "ocr")
+    ]
+    case_list.append(Case("find.sample", _setup_find_sample))
+    for resolution in screen_mod.RESOLUTION_DICT:
+        for template_num in TEMPLATE_NUM_LIST:
+            for scale_name in SCALE_DICT:
+                case_list.append(
+                    Case(
+                        f"find.{resolution}.t{template_num}.{scale_name}",
+                        _bind(_setup_find_screen, resolution, template_num, scale_name),
+                    )
+                )
+    for compress_rate in JPEG_COMPRESS_RATE_LIST:
+        case_list.append(
+            Case(
+                f"find.4k.jpeg.c{compress_rate}",
+                _bind(_setup_find_jpeg, compress_rate),
+            )
+        )
+    case_list.append(Case("http.analyse", _setup_http))
+    return case_list
+
+
+def get_case(name: str) -> Case:
+    for each in get_case_list():
+        if each.name == name:
+            return each
+    raise KeyError(f"no case named: {name}")
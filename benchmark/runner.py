@@ -0,0 +1,155 @@
+""" run cases (each in a fresh process), and compare results with baseline """
+import concurrent.futures
+import fnmatch
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import time
+import typing
+
+import numpy as np
+
+from benchmark import cases as cases_mod
+
+PERCENTILE_LIST = (50, 90, 99)
+
+
+def _get_peak_rss_kb() -> int:
+    """ peak rss of this process, and of its (finished) children, eg: the http server """
+    peak = max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    )
+    # bytes on macos, kilobytes on linux
+    if sys.platform == "darwin":
+        peak //= 1024
+    return peak
+
+
+def _run_case(name: str, repeat: int, warmup: int) -> dict:
+    """ run in a fresh process, so peak rss belongs to this case only """
+    case = cases_mod.get_case(name)
+    try:
+        run, teardown = case.setup()
+    except Exception as e:
+        return {"skipped": f"{type(e).__name__}: {e}"}
+
+    try:
+        ok = True
+        for _ in range(warmup):
+            ok = run() and ok
+        cost_list = list()
+        for _ in range(repeat):
+            start = time.perf_counter()
+            ok = run() and ok
+            cost_list.append(time.perf_counter() - start)
+    finally:
+        if teardown:
+            teardown()
+
+    result = {
+        f"p{each}": float(np.percentile(cost_list, each)) for each in PERCENTILE_LIST
+    }
+    result.update(
+        {
+            "mean": float(np.mean(cost_list)),
+            "min": float(np.min(cost_list)),
+            "max": float(np.max(cost_list)),
+            "repeat": repeat,
+            "peak_rss_kb": _get_peak_rss_kb(),
+            "ok": ok,
+        }
+    )
+    return result
+
+
+def get_env() -> dict:
+    import cv2
+
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+        "opencv_threads": cv2.getNumThreads(),
+    }
+
+
+def run(
+    pattern_list: typing.Sequence[str] = None, repeat: int = None, warmup: int = None
+) -> dict:
+    """
+    :param pattern_list: run cases matching any of them (fnmatch), eg: ['find.*'], all by default
+    :param repeat: measured runs of each case
+    :param warmup: unmeasured runs before measuring
+    :return: {'env': ..., 'cases': {case name: result}}
+    """
+    pattern_list = pattern_list or ["*"]
+    repeat = repeat or 10
+    warmup = 1 if warmup is None else warmup
+
+    name_list = [
+        each.name
+        for each in cases_mod.get_case_list()
+        if any(fnmatch.fnmatch(each.name, pattern) for pattern in pattern_list)
+    ]
+    result_dict = dict()
+    for each_name in name_list:
+        with concurrent.futures.ProcessPoolExecutor(
+            max_workers=1, mp_context=multiprocessing.get_context("spawn")
+        ) as executor:
+            result_dict[each_name] = executor.submit(
+                _run_case, each_name, repeat, warmup
+            ).result()
+        print(format_line(each_name, result_dict[each_name]), flush=True)
+    return {"env": get_env(), "cases": result_dict}
+
+
+def compare(current: dict, baseline: dict, tolerance: float) -> typing.List[str]:
+    """
+    :param current: result of run
+    :param baseline: result of run, saved before
+    :param tolerance: eg: 0.2, slower (or larger) than baseline * 1.2 is a regression
+    :return: regressions
+    """
+    regression_list = list()
+    for each_name, each_result in current["cases"].items():
+        each_baseline = baseline["cases"].get(each_name)
+        if not each_baseline or "skipped" in each_result or "skipped" in each_baseline:
+            continue
+        if each_baseline["ok"] and not each_result["ok"]:
+            regression_list.append(f"{each_name}: result is not correct any more")
+        for key in ("p50", "p90", "peak_rss_kb"):
+            ratio = each_result[key] / max(each_baseline[key], 1e-9)
+            if ratio > 1 + tolerance:
+                regression_list.append(
+                    f"{each_name}: {key} {each_baseline[key]:.4g} -> {each_result[key]:.4g} ({ratio:.2f}x)"
+                )
+    return regression_list
+
+
+def format_line(name: str, result: dict) -> str:
+    if "skipped" in result:
+        return f"{name:<28} skipped ({result['skipped']})"
+    return (
+        f"{name:<28} "
+        + " ".join(
+            f"p{each}={result[f'p{each}'] * 1000:8.2f}ms" for each in PERCENTILE_LIST
+        )
+        + f" rss={result['peak_rss_kb'] / 1024:7.1f}MB"
+        + ("" if result["ok"] else " WRONG RESULT")
+    )
+
+
+def load(path: str) -> dict:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def dump(result: dict, path: str):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2, sort_keys=True)
@@ -0,0 +1,102 @@
+""" synthetic screens, with templates pasted at known positions """
+import os
+import typing
+
+import cv2
+import numpy as np
+
+PIC_DIR_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "sample", "pics"
+)
+TARGET_NAME = "screen.png"
+TEMPLATE_NAME_LIST = [
+    "wechat_logo.png",
+    "app_store_logo.png",
+    "album_logo.png",
+    "music_logo.png",
+]
+
+# name -> (width, height)
+RESOLUTION_DICT = {
+    "720p": (1280, 720),
+    "1080p": (1920, 1080),
+    "4k": (3840, 2160),
+}
+
+
+def load_sample_templates(
+    template_num: int = None,
+) -> typing.List[typing.Tuple[str, np.ndarray]]:
+    """ templates from sample/pics, as (name, cv object) """
+    template_name_list = TEMPLATE_NAME_LIST[:template_num]
+    return [
+        (os.path.splitext(each)[0], cv2.imread(os.path.join(PIC_DIR_PATH, each)))
+        for each in template_name_list
+    ]
+
+
+def build_screen(
+    resolution: str,
+    template_list: typing.Sequence[typing.Tuple[str, np.ndarray]],
+    template_scale: float = 1.0,
+    seed: int = 0,
+) -> typing.Tuple[np.ndarray, typing.Dict[str, typing.Tuple[int, int]]]:
+    """
+    a screen-like picture (blocks, text-like lines and noise), with templates pasted into it.
+    same args always build the same screen.
+
+    :param resolution: key of RESOLUTION_DICT
+    :param template_list: (name, cv object) of templates
+    :param template_scale: templates are resized before pasting
+    :param seed: random seed
+    :return: screen, and center point of each template
+    """
+    width, height = RESOLUTION_DICT[resolution]
+    rng = np.random.default_rng(seed)
+
+    # background with gradient
+    gradient = np.linspace(200, 240, width, dtype=np.float32)
+    screen = np.repeat(np.tile(gradient, (height, 1))[:, :, None], 3, axis=2)
+
+    # blocks, like cards and buttons
+    for _ in range(40):
+        x, y = rng.integers(0, width), rng.integers(0, height)
+        w = rng.integers(width // 20, width // 4)
+        h = rng.integers(height // 30, height // 6)
+        color = rng.integers(0, 256, 3).tolist()
+        cv2.rectangle(screen, (int(x), int(y)), (int(x + w), int(y + h)), color, -1)
+
+    # text-like lines
+    for _ in range(80):
+        x, y = rng.integers(0, width), rng.integers(0, height)
+        w = rng.integers(width // 30, width // 6)
+        thickness = max(1, height // 300)
+        cv2.line(
+            screen, (int(x), int(y)), (int(x + w), int(y)), (40, 40, 40), thickness
+        )
+
+    screen += rng.normal(0, 2, screen.shape).astype(np.float32)
+    screen = np.clip(screen, 0, 255).astype(np.uint8)
+
+    # templates, one for each cell of a grid (never overlapped)
+    cell_num = max(2, int(np.ceil(np.sqrt(len(template_list)))))
+    cell_width, cell_height = width // cell_num, height // cell_num
+    cell_list = rng.permutation(cell_num * cell_num)[: len(template_list)]
+
+    point_dict = dict()
+    for (name, template), cell in zip(template_list, cell_list.tolist()):
+        template = cv2.resize(template, (0, 0), fx=template_scale, fy=template_scale)
+        template_height, template_width = template.shape[:2]
+        assert (
+            template_width < cell_width and template_height < cell_height
+        ), f"template {name} is too large for {resolution}"
+
+        left = (cell % cell_num) * cell_width + int(
+            rng.integers(0, cell_width - template_width)
+        )
+        top = (cell // cell_num) * cell_height + int(
+            rng.integers(0, cell_height - template_height)
+        )
+        screen[top : top + template_height, left : left + template_width] = template
+        point_dict[name] = (left + template_width // 2, top + template_height // 2)
+    return screen, point_dict
@@ -0,0 +1,368 @@
+import collections
+import contextlib
+import copy
+import hashlib
+import itertools
+import json
+import os
+import threading
+import time
+import weakref
+import typing
+
+import numpy as np
+
+from findit import serialize, toolbox
+
+
+def get_nbytes(obj: typing.Any) -> int:
+    """ rough memory cost of an object, only numpy arrays (and containers of them) are counted """
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes
+    if isinstance(obj, (bytes, bytearray)):
+        return len(obj)
+    if isinstance(obj, dict):
+        return sum(get_nbytes(each) for each in obj.values())
+    if isinstance(obj, (list, tuple)):
+        return sum(get_nbytes(each) for each in obj)
+    return 0
+
+
+class LRUCache(object):
+    """ thread-safe LRU cache, limited by total bytes and/or item count, and optionally by age """
+
+    def __init__(
+        self,
+        max_bytes: int = None,
+        max_size: int = None,
+        size_func: typing.Callable[[typing.Any], int] = None,
+        ttl: float = None,
+    ):
+        """
+        :param max_bytes: byte budget, no limit if None
+        :param max_size: item limit, no limit if None
+        :param size_func: calculate the cost of value, default to get_nbytes
+        :param ttl: seconds, items put earlier than this are expired. no limit if None
+        """
+        self.max_bytes = max_bytes
+        self.max_size = max_size
+        self.size_func = size_func or get_nbytes
+        self.ttl = ttl
+
+        self._data: collections.OrderedDict = collections.OrderedDict()
+        self._size_dict: typing.Dict[typing.Hashable, int] = dict()
+        self._put_time_dict: typing.Dict[typing.Hashable, float] = dict()
+        self._lock = threading.RLock()
+
+        self.nbytes: int = 0
+        self.hit: int = 0
+        self.miss: int = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def get(self, key: typing.Hashable, default: typing.Any = None) -> typing.Any:
+        with self._lock:
+            if key in self._data and self._is_expired(key):
+                self._discard(key)
+            if key not in self._data:
+                self.miss += 1
+                return default
+            self.hit += 1
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def put(self, key: typing.Hashable, value: typing.Any):
+        """ add or refresh an item, its size will be (re)calculated """
+        size = self.size_func(value)
+        with self._lock:
+            self._discard(key)
+            # too large to be cached (or no budget at all)
+            if self.max_bytes is not None and (
+                not self.max_bytes or size > self.max_bytes
+            ):
+                return
+            self._data[key] = value
+            self._size_dict[key] = size
+            self._put_time_dict[key] = time.monotonic()
+            self.nbytes += size
+            self._evict()
+
+    def pop(self, key: typing.Hashable, default: typing.Any = None) -> typing.Any:
+        with self._lock:
+            value = self._data.get(key, default)
+            self._discard(key)
+            return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._size_dict.clear()
+            self._put_time_dict.clear()
+            self.nbytes = 0
+
+    def keys(self) -> typing.List[typing.Hashable]:
+        with self._lock:
+            return list(self._data.keys())
+
+    def items(self) -> typing.List[typing.Tuple[typing.Hashable, typing.Any]]:
+        """ unexpired items, from the oldest. they are not counted (hit or miss) or refreshed """
+        with self._lock:
+            return [
+                (key, value)
+                for key, value in self._data.items()
+                if not self._is_expired(key)
+            ]
+
+    def _discard(self, key: typing.Hashable):
+        if key in self._data:
+            del self._data[key]
+            del self._put_time_dict[key]
+            self.nbytes -= self._size_dict.pop(key)
+
+    def _is_expired(self, key: typing.Hashable) -> bool:
+        if self.ttl is None:
+            return False
+        return time.monotonic() - self._put_time_dict[key] > self.ttl
+
+    def _evict(self):
+        while self._data and (
+            (self.max_bytes is not None and self.nbytes > self.max_bytes)
+            or (self.max_size is not None and len(self._data) > self.max_size)
+        ):
+            oldest_key = next(iter(self._data))
+            self._discard(oldest_key)
+
+    def get_stat(self) -> dict:
+        return {
+            "size": len(self._data),
+            "nbytes": self.nbytes,
+            "max_bytes": self.max_bytes,
+            "max_size": self.max_size,
+            "ttl": self.ttl,
+            "hit": self.hit,
+            "miss": self.miss,
+        }
+
+
+# derived forms of pictures, eg: scaled templates or feature descriptors.
+# they live as long as their source picture, and will be released with it.
+_derived_dict: typing.Dict[int, dict] = dict()
+_derived_lock = threading.Lock()
+_uid_counter = itertools.count()
+
+
+def derive(
+    source: np.ndarray, key: typing.Hashable, factory: typing.Callable[[], typing.Any]
+) -> typing.Any:
+    """
+    get (or build and remember) something derived from source picture
+
+    :param source: source picture, should not be modified after deriving
+    :param key: unique name of the derived form, eg: ('scale', 1.2)
+    :param factory: build the derived form if not existed
+    :return:
+
+    derived forms which are (or are views of) source itself will not be remembered,
+    otherwise source will never be released.
+    """
+    source_id = id(source)
+    with _derived_lock:
+        form_dict = _derived_dict.get(source_id)
+        if form_dict is None:
+            form_dict = dict()
+            _derived_dict[source_id] = form_dict
+            weakref.finalize(source, _derived_dict.pop, source_id, None)
+        elif key in form_dict:
+            return form_dict[key]
+
+    # build it outside the lock, other pictures should not wait for this one
+    value = factory()
+    if value is source or getattr(value, "base", None) is source:
+        return value
+    with _derived_lock:
+        return form_dict.setdefault(key, value)
+
+
+def get_derived_nbytes(source: np.ndarray) -> int:
+    """ total cost of derived forms of source picture """
+    with _derived_lock:
+        form_dict = _derived_dict.get(id(source))
+        if not form_dict:
+            return 0
+        form_list = list(form_dict.values())
+    return get_nbytes(form_list)
+
+
+def get_uid(source: np.ndarray) -> int:
+    """ unique and never-reused id of source picture, unlike id() """
+    return derive(source, "uid", lambda: next(_uid_counter))
+
+
+class ResultCache(object):
+    """
+    results of finding, by target content and context (templates, engine config and args).
+
+    1. exact: same pixels of target, in the same context
+    2. near (optional): perceptual hash of target is close enough to a cached one's, in the same context
+    3. disk (optional): exact results which are saved to disk, shared by processes and restarts
+
+    results from memory are deep copies, results from disk are decoded from json (tuples become lists).
+    """
+
+    # result sources
+    SOURCE_EXACT: str = "exact"
+    SOURCE_NEAR: str = "near"
+    SOURCE_DISK: str = "disk"
+
+    # oldest files will be removed if more than this
+    DISK_MAX_FILE_NUM: int = 4096
+    # check file num once every N puts
+    DISK_CLEAN_INTERVAL: int = 64
+
+    def __init__(
+        self,
+        max_size: int,
+        ttl: float = None,
+        near_distance: int = None,
+        disk_dir: str = None,
+    ):
+        """
+        :param max_size: results in memory
+        :param ttl: seconds, results older than this are expired (in memory and on disk)
+        :param near_distance: max hamming distance of perceptual hashes (0-64) for near lookup, disabled if None
+        :param disk_dir: save results to this directory too, disabled if None
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.near_distance = near_distance
+        self.disk_dir = disk_dir
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+
+        # (context key, content hash) -> (perceptual hash, result)
+        self._memory = LRUCache(max_size=max_size, ttl=ttl)
+        self._lock = threading.Lock()
+        self._put_count: int = 0
+        self._stat_dict: typing.Dict[str, int] = {
+            self.SOURCE_EXACT: 0,
+            self.SOURCE_NEAR: 0,
+            self.SOURCE_DISK: 0,
+            "miss": 0,
+        }
+
+    def get(
+        self, context_key: str, content_hash: str, perceptual_hash: int = None
+    ) -> typing.Tuple[typing.Optional[dict], typing.Optional[str]]:
+        """
+        :return: (result, its source (SOURCE_*)), or (None, None) if missing
+        """
+        result, source = self._get(context_key, content_hash, perceptual_hash)
+        with self._lock:
+            self._stat_dict[source or "miss"] += 1
+        return result, source
+
+    def _get(
+        self, context_key: str, content_hash: str, perceptual_hash: int = None
+    ) -> typing.Tuple[typing.Optional[dict], typing.Optional[str]]:
+        item = self._memory.get((context_key, content_hash))
+        if item is not None:
+            return copy.deepcopy(item[1]), self.SOURCE_EXACT
+
+        if self.disk_dir:
+            result = self._load_from_disk(context_key, content_hash)
+            if result is not None:
+                # back to memory
+                self._memory.put((context_key, content_hash), (perceptual_hash, result))
+                return copy.deepcopy(result), self.SOURCE_DISK
+
+        if self.near_distance is not None and perceptual_hash is not None:
+            # the closest one
+            best_distance, best_result = self.near_distance + 1, None
+            for (each_context_key, _), (each_hash, each_result) in self._memory.items():
+                if each_context_key != context_key or each_hash is None:
+                    continue
+                distance = toolbox.get_hash_distance(each_hash, perceptual_hash)
+                if distance < best_distance:
+                    best_distance, best_result = distance, each_result
+            if best_result is not None:
+                return copy.deepcopy(best_result), self.SOURCE_NEAR
+
+        return None, None
+
+    def put(
+        self,
+        context_key: str,
+        content_hash: str,
+        result: dict,
+        perceptual_hash: int = None,
+    ):
+        result = copy.deepcopy(result)
+        self._memory.put((context_key, content_hash), (perceptual_hash, result))
+        if self.disk_dir:
+            self._save_to_disk(context_key, content_hash, result)
+
+    def clear(self):
+        """ memory only """
+        self._memory.clear()
+
+    def get_stat(self) -> dict:
+        with self._lock:
+            stat_dict = dict(self._stat_dict)
+        stat_dict["hit"] = sum(v for k, v in stat_dict.items() if k != "miss")
+        stat_dict["size"] = len(self._memory)
+        return stat_dict
+
+    def _get_disk_path(self, context_key: str, content_hash: str) -> str:
+        name = hashlib.sha1(f"{context_key}/{content_hash}".encode()).hexdigest()
+        return os.path.join(self.disk_dir, f"{name}.json")
+
+    def _load_from_disk(
+        self, context_key: str, content_hash: str
+    ) -> typing.Optional[dict]:
+        path = self._get_disk_path(context_key, content_hash)
+        try:
+            if self.ttl is not None and time.time() - os.path.getmtime(path) > self.ttl:
+                return None
+            with open(path, encoding="utf-8") as f:
+                return json.load(f)
+        # missing, or removed by others
+        except (OSError, ValueError):
+            return None
+
+    def _save_to_disk(self, context_key: str, content_hash: str, result: dict):
+        path = self._get_disk_path(context_key, content_hash)
+        # write and rename, readers never see a partial file
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(serialize.dumps(result))
+        os.replace(temp_path, path)
+
+        with self._lock:
+            self._put_count += 1
+            need_clean = self._put_count % self.DISK_CLEAN_INTERVAL == 0
+        if need_clean:
+            self._clean_disk()
+
+    def _clean_disk(self):
+        """ remove the oldest files """
+        path_list = [
+            os.path.join(self.disk_dir, each)
+            for each in os.listdir(self.disk_dir)
+            if each.endswith(".json")
+        ]
+        if len(path_list) <= self.DISK_MAX_FILE_NUM:
+            return
+        mtime_list = list()
+        for each in path_list:
+            try:
+                mtime_list.append((os.path.getmtime(each), each))
+            except OSError:
+                pass
+        mtime_list.sort()
+        for _, each in mtime_list[: len(mtime_list) - self.DISK_MAX_FILE_NUM]:
+            with contextlib.suppress(OSError):
+                os.remove(each)
@@ -2,46 +2,168 @@ import os
 import numpy as np
 import typing
 import json
+import multiprocessing
+import concurrent.futures
+import functools
+import collections
+import threading
+import hashlib
 
 # DO NOT remove this
 import cv2
 
 from findit.logger import logger, LOGGER_FLAG
 from findit import toolbox
+from findit.cache import (
+    LRUCache,
+    ResultCache,
+    derive,
+    get_nbytes,
+    get_derived_nbytes,
+    get_uid,
+)
+from findit.timer import get_timer
 from findit.engine import engine_dict, FindItEngineResponse, FindItEngine
 
 
 class _TemplateManager(object):
-    def __init__(self):
+    """
+    keep loaded templates and their decoded (grey) pictures.
+
+    decoded pictures will be cached (LRU, limited by bytes), so repeated finds only pay for target.
+    budget 0 means no caching.
+    templates from path will be reloaded once their files changed (mtime or size).
+    thread-safe: load iterates a snapshot, templates saved or reset during it are not seen.
+    """
+
+    # 256 MB
+    DEFAULT_CACHE_BYTES: int = 256 * 1024 * 1024
+
+    def __init__(self, cache_bytes: int = None):
+        self._lock = threading.Lock()
         self._template_list: list = list()
+        # template name -> search region
+        self._region_dict: typing.Dict[str, typing.Sequence] = dict()
+        # template name -> mask (path or object)
+        self._mask_dict: typing.Dict[str, typing.Union[str, np.ndarray]] = dict()
+        self._cache: LRUCache = LRUCache(
+            max_bytes=self.DEFAULT_CACHE_BYTES if cache_bytes is None else cache_bytes,
+            # derived forms (eg: scaled templates) also count
+            size_func=lambda o: get_nbytes(o) + get_derived_nbytes(o[1]),
+        )
 
     def reset(self):
-        self._template_list = list()
-
-    def save(self, pic_name: str, pic_item: typing.Union[str, np.ndarray]):
-        self._template_list.append((pic_name, pic_item))
+        with self._lock:
+            self._template_list = list()
+            self._region_dict = dict()
+            self._mask_dict = dict()
+        # objects are not reusable after reset, but decoded files are
+        for each_key in self._cache.keys():
+            if each_key[0] == "object":
+                self._cache.pop(each_key)
+
+    def save(
+        self,
+        pic_name: str,
+        pic_item: typing.Union[str, np.ndarray],
+        region: typing.Sequence = None,
+        mask_item: typing.Union[str, np.ndarray] = None,
+    ):
+        with self._lock:
+            # replaced, not changed in place, for running loads
+            self._template_list = self._template_list + [(pic_name, pic_item)]
+            if region is not None:
+                self._region_dict = {**self._region_dict, pic_name: region}
+            if mask_item is not None:
+                self._mask_dict = {**self._mask_dict, pic_name: mask_item}
+
+    def get_region(self, pic_name: str) -> typing.Optional[typing.Sequence]:
+        return self._region_dict.get(pic_name)
+
+    def get_mask(self, pic_name: str) -> typing.Optional[np.ndarray]:
+        """ decoded (grey) mask, cached like templates """
+        mask_item = self._mask_dict.get(pic_name)
+        if mask_item is None:
+            return None
+        return self._load_one(mask_item)
 
     def load(self) -> tuple:
-        for pic_name, pic_item in self._template_list:
-            # is path
-            if isinstance(pic_item, str):
-                yield pic_name, toolbox.load_grey_from_path(pic_item)
-            # is object
-            else:
-                yield pic_name, toolbox.load_grey_from_cv2_object(pic_item)
+        with self._lock:
+            template_list = self._template_list
+        for pic_name, pic_item in template_list:
+            yield pic_name, self._load_one(pic_item)
+
+    def _load_one(self, pic_item: typing.Union[str, np.ndarray]) -> np.ndarray:
+        # no caching
+        if not self._cache.max_bytes:
+            return toolbox.load_grey(pic_item)[0]
+
+        # is path
+        if isinstance(pic_item, str):
+            key = ("path", pic_item)
+            # file may be changed
+            stat = os.stat(pic_item)
+            signature = (stat.st_mtime_ns, stat.st_size)
+        # is object
+        else:
+            # identity (never reused, unlike id). should not be modified after loading
+            key = ("object", get_uid(pic_item))
+            signature = (pic_item.shape, pic_item.dtype.str)
+
+        cached = self._cache.get(key)
+        if cached and cached[0] == signature:
+            # refresh its size, because derived forms may be changed
+            self._cache.put(key, cached)
+            return cached[1]
+
+        grey_pic, _ = toolbox.load_grey(pic_item)
+        self._cache.put(key, (signature, grey_pic))
+        return grey_pic
 
     def is_empty(self):
         return len(self._template_list) == 0
 
+    def dump(self) -> typing.List[typing.Tuple]:
+        """ all the templates, decoded, as (name, pic object, region, mask object) """
+        return [
+            (pic_name, pic_object, self.get_region(pic_name), self.get_mask(pic_name))
+            for pic_name, pic_object in self.load()
+        ]
+
+    def get_cache_stat(self) -> dict:
+        return self._cache.get_stat()
+
 
 class FindIt(object):
-    """ FindIt Operator """
+    """
+    FindIt Operator
+
+    thread-safety: one FindIt can be shared by threads.
+    find (and find_many, track) can be called concurrently, they never change FindIt or its engines.
+    load_template and clear can be called meanwhile, running finds keep the templates they started with.
+    """
+
+    # for track
+    DEFAULT_TRACK_DIFF_THRESHOLD: float = 1.0
+    DEFAULT_TRACK_WINDOW_RATE: float = 2.0
+    # 0 means no limit
+    DEFAULT_TRACK_SIM_THRESHOLD: float = 0.0
+    DEFAULT_TRACK_SIM_DROP: float = 0.005
+    TRACK_RESULT_FIELDS: typing.Sequence[str] = ("ok", "target_point", "target_sim")
 
     def __init__(
         self,
         need_log: bool = None,
         engine: typing.Sequence = None,
         pro_mode: bool = None,
+        template_cache_bytes: int = None,
+        worker_num: int = None,
+        result_fields: typing.Sequence[str] = None,
+        timing: bool = None,
+        result_cache_size: int = None,
+        result_cache_ttl: float = None,
+        result_cache_near_distance: int = None,
+        result_cache_dir: str = None,
         *args,
         **kwargs,
     ):
@@ -51,6 +173,19 @@ class FindIt(object):
         :param need_log: enable or disable logger
         :param engine: choose image processing engine, eg: ['feature', 'template']
         :param pro_mode:
+        :param template_cache_bytes: memory budget of decoded templates, default to 256 MB. 0 means no caching
+        :param worker_num: if larger than 1, templates and scales will be matched in a thread pool of this size
+        :param result_fields: keep these keys only in engine results, eg: ['target_point', 'target_sim'].
+            unselected parts (eg: conf and raw) will not be built at all.
+        :param timing: record costs of stages (eg: decode, compress, match), default to pro_mode.
+            they will be in result as 'timing', and in engine results (pro mode only).
+        :param result_cache_size: if larger than 0, results of recent targets will be reused (eg: the same screen again).
+            keyed by target pixels, templates (and their regions and masks), engine config and args of find.
+            result will contain 'result_cache' (source of result, or 'miss'). see findit.cache.ResultCache
+        :param result_cache_ttl: seconds, cached results older than this will not be used. no limit by default
+        :param result_cache_near_distance: reuse results of similar targets too,
+            if hamming distance between their perceptual hashes (0-64) is not larger than this. exact only by default
+        :param result_cache_dir: save results to this directory too, shared by processes and restarts
 
         kwargs here will be used to init engine, which starts with engine_{engine_name} :
 
@@ -58,9 +193,14 @@ class FindIt(object):
             engine_feature_cluster_num: int = None,
             engine_feature_distance_threshold: float = None,
             engine_feature_min_hessian: int = None,
+            engine_feature_cluster_method: str = None,
 
             # ocr
             engine_ocr_lang: str = None,
+            engine_ocr_cache_size: int = None,
+            engine_ocr_process_num: int = None,
+            engine_ocr_tile_height: int = None,
+            engine_ocr_tile_overlap: int = None,
 
             # sim
             engine_sim_interpolation: int = None,
@@ -71,9 +211,30 @@ class FindIt(object):
             engine_template_multi_target_max_threshold: float = None,
             engine_template_multi_target_distance_threshold: float = None,
             engine_template_compress_rate: float = None,
+            engine_template_pyramid_level: int = None,
+            engine_template_pyramid_top_k: int = None,
+            engine_template_fft: bool = None,
+            engine_template_fft_cache_bytes: int = None,
+            engine_template_scale_search: str = None,
+            engine_template_early_stop_sim: float = None,
         """
+        # for building the same findit in other processes
+        self._init_kwargs = dict(
+            need_log=need_log,
+            engine=engine,
+            pro_mode=pro_mode,
+            template_cache_bytes=template_cache_bytes,
+            result_fields=result_fields,
+            timing=timing,
+            result_cache_size=result_cache_size,
+            result_cache_ttl=result_cache_ttl,
+            result_cache_near_distance=result_cache_near_distance,
+            result_cache_dir=result_cache_dir,
+            **kwargs,
+        )
+
         # template manager
-        self.template: _TemplateManager = _TemplateManager()
+        self.template: _TemplateManager = _TemplateManager(template_cache_bytes)
 
         # init logger
         self.switch_logger(bool(need_log))
@@ -89,6 +250,30 @@ class FindIt(object):
         # pro mode
         self.pro_mode = bool(pro_mode)
         logger.info(f"in pro mode: {self.pro_mode}")
+        self.result_fields = result_fields
+        logger.info(f"result fields: {self.result_fields}")
+        self.timing = self.pro_mode if timing is None else bool(timing)
+        logger.info(f"timing: {self.timing}")
+
+        # executor (opt-in)
+        self.worker_num = worker_num or 1
+        self.executor: typing.Optional[concurrent.futures.Executor] = None
+        if self.worker_num > 1:
+            self.executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=self.worker_num, thread_name_prefix="findit"
+            )
+        logger.info(f"worker num: {self.worker_num}")
+
+        # result cache (opt-in)
+        self.result_cache: typing.Optional[ResultCache] = None
+        if result_cache_size:
+            self.result_cache = ResultCache(
+                result_cache_size,
+                ttl=result_cache_ttl,
+                near_distance=result_cache_near_distance,
+                disk_dir=result_cache_dir,
+            )
+        logger.info(f"result cache size: {result_cache_size}")
 
     @staticmethod
     def switch_logger(status: bool):
@@ -104,9 +289,21 @@ class FindIt(object):
         self.engine_list = [
             engine_dict[each](*args, **kwargs) for each in engine_name_list
         ]
+        # engines never change after init, so their config is a part of result cache key
+        self._engine_signature = json.dumps(
+            [[each.get_type(), each.get_conf()] for each in self.engine_list],
+            sort_keys=True,
+            default=str,
+        )
 
     def load_template(
-        self, pic_name: str, pic_path: str = None, pic_object: np.ndarray = None
+        self,
+        pic_name: str,
+        pic_path: str = None,
+        pic_object: np.ndarray = None,
+        region: typing.Sequence = None,
+        mask_pic_path: str = None,
+        mask_pic_object: np.ndarray = None,
     ):
         """
         load template picture
@@ -114,19 +311,27 @@ class FindIt(object):
         :param pic_name: use pic name as result's key, eg: 'your_picture_1'
         :param pic_path: eg: '../your_picture.png'
         :param pic_object: eg: your_pic_cv_object)
+        :param region: search this template in a part of target only, (left, top, right, bottom).
+            absolute (pixels, eg: (0, 0, 1080, 100)) or fractional (all in [0, 1] with any float, eg: (0, 0, 1, 0.1))
+        :param mask_pic_path: mask of this template (for template engine), pixels of template are ignored where mask is 0
+        :param mask_pic_object: mask of this template, as cv object. should not be modified after loading
         :return:
         """
         assert (pic_path is not None) or (
             pic_object is not None
         ), "need path or cv object"
 
+        mask_item = mask_pic_object
+        if mask_item is None and mask_pic_path is not None:
+            mask_item = os.path.abspath(mask_pic_path)
+
         if pic_object is not None:
             logger.info("load template from picture object directly ...")
-            self.template.save(pic_name, pic_object)
+            self.template.save(pic_name, pic_object, region, mask_item)
         else:
             logger.info("load template from picture path ...")
             abs_path = os.path.abspath(pic_path)
-            self.template.save(pic_name, abs_path)
+            self.template.save(pic_name, abs_path, region, mask_item)
 
         logger.info(f"load template [{pic_name}] successfully")
 
@@ -136,11 +341,18 @@ class FindIt(object):
         """
         return self.engine_name_list != ["ocr"]
 
+    def _get_decode_reduce(self) -> int:
+        """ encoded target can be decoded in 1/reduce size, if all the engines allow """
+        return toolbox.get_reduce(
+            max(each.get_min_target_scale() for each in self.engine_list)
+        )
+
     def find(
         self,
         target_pic_name: str,
         target_pic_path: str = None,
         target_pic_object: np.ndarray = None,
+        template_region_dict: typing.Dict[str, typing.Sequence] = None,
         *args,
         **kwargs,
     ) -> dict:
@@ -149,15 +361,21 @@ class FindIt(object):
 
         :param target_pic_name: eg: 'your_target_picture_1'
         :param target_pic_path: '/path/to/your/target.png'
-        :param target_pic_object: your_pic_cv_object (loaded by cv2)
+        :param target_pic_object: your_pic_cv_object (loaded by cv2), or encoded bytes (eg: png)
+            grey uint8 objects are used directly, without copying
+        :param template_region_dict: search regions of templates, overwrite regions from load_template.
+            eg: {'your_picture_1': (0.0, 0.9, 1.0, 1.0)}
 
         kwargs here will be used to engine.execute(), which starts with engine_{engine_name}:
 
+            # all
+            result_fields: typing.Sequence[str] = None, (overwrite the one from __init__)
+
             # ocr
             engine_ocr_offset: int = None,
             engine_ocr_deep: bool = None,
 
-            # template
+            # template (overwrite masks from load_template, for all the templates)
             engine_template_mask_pic_object: np.ndarray = None,
             engine_template_mask_pic_path: str = None,
         :return:
@@ -168,31 +386,392 @@ class FindIt(object):
             target_pic_object is not None
         ), "need path or cv object"
 
-        # load target
-        logger.info("start finding ...")
-        target_pic_object = toolbox.pre_pic(target_pic_path, target_pic_object)
+        timer = get_timer(self.timing)
+        # template name -> engine name -> stage name -> cost
+        timing_dict = dict() if timer else None
+
+        with timer.stage("total"):
+            # load target
+            logger.info("start finding ...")
+            with timer.stage("decode"):
+                target_item = (
+                    target_pic_path if target_pic_object is None else target_pic_object
+                )
+                # encoded target can be decoded in reduced size (cheaper), if engines allow
+                decode_reduce = 1
+                if not (
+                    isinstance(target_item, np.ndarray) or kwargs.get("_mark_pic")
+                ):
+                    decode_reduce = self._get_decode_reduce()
+                target_pic_object, load_path = toolbox.load_grey(
+                    target_item, decode_reduce
+                )
+            logger.debug(f"target loaded via: {load_path}")
+            if decode_reduce > 1:
+                kwargs["target_scale"] = 1 / decode_reduce
+            if kwargs.get("result_fields") is None:
+                kwargs["result_fields"] = self.result_fields
+
+            result, cache_key, cache_source = None, None, None
+            if self.result_cache is not None:
+                with timer.stage("result_cache"):
+                    cache_key = self._get_result_cache_key(
+                        target_pic_object, template_region_dict, args, kwargs
+                    )
+                    result, cache_source = self.result_cache.get(*cache_key)
+                # result without template is named after target
+                if result is not None and not self._need_template():
+                    result = {target_pic_name: next(iter(result.values()))}
+
+            if result is None:
+                if self._need_template():
+                    find_func = functools.partial(
+                        self._find_with_template,
+                        template_region_dict=template_region_dict,
+                    )
+                else:
+                    find_func = self._find_without_template
+                result = find_func(
+                    target_pic_object,
+                    target_pic_name=target_pic_name,
+                    target_pic_path=target_pic_path,
+                    timing_dict=timing_dict,
+                    *args,
+                    **kwargs,
+                )
+                if cache_key is not None:
+                    context_key, content_hash, perceptual_hash = cache_key
+                    self.result_cache.put(
+                        context_key, content_hash, result, perceptual_hash
+                    )
 
+        response = {
+            "target_name": target_pic_name,
+            "target_path": target_pic_path,
+            "data": result,
+        }
+        if self.result_cache is not None:
+            response["result_cache"] = cache_source or "miss"
+        if timer:
+            response["timing"] = {**timer.get_dict(), "engine": timing_dict}
+            # eg: 'grey' (no copy) or 'imdecode', see toolbox.load_grey
+            response["load_path"] = load_path
+        return response
+
+    def _get_result_cache_key(
+        self,
+        target_pic_object: np.ndarray,
+        template_region_dict: typing.Optional[dict],
+        args: typing.Sequence,
+        kwargs: dict,
+    ) -> typing.Tuple[str, str, typing.Optional[int]]:
+        """ (context key, content hash of target, perceptual hash of target or None) """
+        template_list = list()
         if self._need_template():
-            find_func = self._find_with_template
-        else:
-            find_func = self._find_without_template
-        result = find_func(
+            for each_name, each_pic_object in self.template.load():
+                each_mask = self.template.get_mask(each_name)
+                template_list.append(
+                    [
+                        each_name,
+                        _get_pic_hash(each_pic_object),
+                        self.template.get_region(each_name),
+                        None if each_mask is None else _get_pic_hash(each_mask),
+                    ]
+                )
+        context = json.dumps(
+            [
+                self._engine_signature,
+                self.pro_mode,
+                template_list,
+                template_region_dict,
+                args,
+                kwargs,
+            ],
+            sort_keys=True,
+            default=lambda o: _get_pic_hash(o) if isinstance(o, np.ndarray) else str(o),
+        )
+        context_key = hashlib.sha1(context.encode()).hexdigest()
+
+        perceptual_hash = None
+        if self.result_cache.near_distance is not None:
+            perceptual_hash = toolbox.get_dhash(target_pic_object)
+        return context_key, toolbox.get_content_hash(target_pic_object), perceptual_hash
+
+    def find_many(
+        self,
+        target_iter: typing.Iterable[typing.Union[str, np.ndarray]],
+        process_num: int = None,
+        ordered: bool = None,
+        max_in_flight: int = None,
+        *args,
+        **kwargs,
+    ) -> typing.Generator[dict, None, None]:
+        """
+        find templates in many targets, with a process pool.
+
+        templates are decoded here, and shipped to each worker once (not for each target).
+        targets are submitted lazily, at most max_in_flight targets are being handled at the same time,
+        so memory stays flat whatever the size of target_iter is.
+
+        :param target_iter: targets, paths (better, cheaper to ship) or cv objects
+        :param process_num: default to cpu count
+        :param ordered: yield results in order of targets (default), or as soon as they are completed
+        :param max_in_flight: default to process_num * 2
+
+        args and kwargs here will be used to find()
+        :return: results like find(), with 'target_id' (index in target_iter)
+        """
+        assert not args, "use kwargs for find() in find_many"
+        process_num = process_num or os.cpu_count() or 1
+        ordered = True if ordered is None else ordered
+        max_in_flight = max_in_flight or process_num * 2
+
+        # spawn: forking a process with running threads (eg: thread pool of FindIt) is not safe
+        with concurrent.futures.ProcessPoolExecutor(
+            max_workers=process_num,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self._init_kwargs, self.template.dump()),
+        ) as executor:
+            future_queue: typing.Deque[concurrent.futures.Future] = collections.deque()
+            target_iter = enumerate(target_iter)
+
+            def _submit() -> bool:
+                """ submit next target, return False if no more target """
+                try:
+                    target_id, target = next(target_iter)
+                except StopIteration:
+                    return False
+                future_queue.append(
+                    executor.submit(_find_in_worker, target_id, target, kwargs)
+                )
+                return True
+
+            has_more = True
+            while has_more or future_queue:
+                while has_more and len(future_queue) < max_in_flight:
+                    has_more = _submit()
+                if not future_queue:
+                    break
+
+                if ordered:
+                    yield future_queue.popleft().result()
+                    continue
+
+                done_set, _ = concurrent.futures.wait(
+                    future_queue, return_when=concurrent.futures.FIRST_COMPLETED
+                )
+                for each_future in [each for each in future_queue if each in done_set]:
+                    future_queue.remove(each_future)
+                    yield each_future.result()
+
+    def track(
+        self,
+        frame_iter: typing.Iterable[typing.Union[str, np.ndarray]],
+        diff_threshold: float = None,
+        window_rate: float = None,
+        sim_threshold: float = None,
+        sim_drop: float = None,
+        *args,
+        **kwargs,
+    ) -> typing.Generator[dict, None, None]:
+        """
+        find templates in a stream of frames (eg: screen recording), and yield result of each frame.
+
+        1. frames which look the same as the last analysed one will be skipped (with its result)
+        2. templates are searched in a window around their last positions first
+        3. and in the whole frame if missing
+
+        :param frame_iter: frames, paths or cv objects
+        :param diff_threshold: frame will be skipped if mean abs diff (0-255) of its thumbnail is lower than this
+        :param window_rate: half size of window = window_rate * the largest size of template which engines match
+        :param sim_threshold: result is missing if its target_sim is lower than this, no limit by default
+        :param sim_drop: result in window is missing if its target_sim is lower than the last one by more than this.
+            wrong places may score high too (eg: 0.97 with TM_CCORR_NORMED), but lower than the right one
+
+        args and kwargs here will be used to find()
+        :return: results like find(), with 'frame_id' and 'skipped'
+        """
+        diff_threshold = (
+            self.DEFAULT_TRACK_DIFF_THRESHOLD if diff_threshold is None else diff_threshold
+        )
+        window_rate = window_rate or self.DEFAULT_TRACK_WINDOW_RATE
+        sim_threshold = (
+            self.DEFAULT_TRACK_SIM_THRESHOLD if sim_threshold is None else sim_threshold
+        )
+        sim_drop = self.DEFAULT_TRACK_SIM_DROP if sim_drop is None else sim_drop
+
+        # fields for tracking are always needed, and others will be removed after that
+        result_fields = kwargs.get("result_fields")
+        if result_fields is None:
+            result_fields = self.result_fields
+        if result_fields:
+            kwargs["result_fields"] = list(
+                set(result_fields) | set(self.TRACK_RESULT_FIELDS)
+            )
+
+        last_thumbnail: typing.Optional[np.ndarray] = None
+        last_result: typing.Optional[dict] = None
+        # template name -> its last (position, sim)
+        last_hit_dict: typing.Dict[str, typing.Tuple] = dict()
+
+        for frame_id, each_frame in enumerate(frame_iter):
+            if isinstance(each_frame, str):
+                target_pic_name, target_pic_path = each_frame, each_frame
+            else:
+                target_pic_name, target_pic_path = f"frame_{frame_id}", None
+            target_pic_object, _ = toolbox.load_grey(each_frame)
+
+            # nothing changed
+            thumbnail = toolbox.get_thumbnail(target_pic_object)
+            if (
+                last_result is not None
+                and thumbnail.shape == last_thumbnail.shape
+                and toolbox.get_mean_diff(thumbnail, last_thumbnail) < diff_threshold
+            ):
+                yield {
+                    **last_result,
+                    "target_name": target_pic_name,
+                    "target_path": target_pic_path,
+                    "frame_id": frame_id,
+                    "skipped": True,
+                }
+                continue
+            last_thumbnail = thumbnail
+
+            if not self._need_template():
+                data = self._find_without_template(
+                    target_pic_object, target_pic_name=target_pic_name, *args, **kwargs
+                )
+            else:
+                data = self._track_templates(
+                    target_pic_object,
+                    last_hit_dict,
+                    window_rate,
+                    sim_threshold,
+                    sim_drop,
+                    *args,
+                    **kwargs,
+                )
+                # update positions
+                for each_template_name, each_result in data.items():
+                    each_hit = self._get_track_hit(each_result, sim_threshold)
+                    if each_hit is None:
+                        last_hit_dict.pop(each_template_name, None)
+                    else:
+                        last_hit_dict[each_template_name] = each_hit
+
+            if result_fields:
+                for each_result in data.values():
+                    for each_engine_name, each_engine_result in each_result.items():
+                        each_result[each_engine_name] = {
+                            k: v
+                            for k, v in each_engine_result.items()
+                            if k in result_fields
+                        }
+            last_result = {
+                "target_name": target_pic_name,
+                "target_path": target_pic_path,
+                "data": data,
+            }
+            yield {**last_result, "frame_id": frame_id, "skipped": False}
+
+    def _track_templates(
+        self,
+        target_pic_object: np.ndarray,
+        last_hit_dict: typing.Dict[str, typing.Tuple],
+        window_rate: float,
+        sim_threshold: float,
+        sim_drop: float,
+        *args,
+        **kwargs,
+    ) -> dict:
+        # windows around last positions, large enough for the largest template
+        max_template_scale = max(
+            each.get_max_template_scale() for each in self.engine_list
+        )
+        template_region_dict = dict()
+        for each_template_name, each_template_object in self.template.load():
+            if each_template_name not in last_hit_dict:
+                continue
+            (x, y), _ = last_hit_dict[each_template_name]
+            # frame size changed
+            if not (
+                0 <= x < target_pic_object.shape[1]
+                and 0 <= y < target_pic_object.shape[0]
+            ):
+                continue
+            template_height, template_width = [
+                each * max_template_scale for each in each_template_object.shape[:2]
+            ]
+            half_size = int(window_rate * max(template_height, template_width))
+            region = toolbox.get_region(
+                target_pic_object.shape,
+                (
+                    int(x) - half_size,
+                    int(y) - half_size,
+                    int(x) + half_size,
+                    int(y) + half_size,
+                ),
+            )
+            # window is cut by the edges of target, and template does not fit in it
+            left, top, right, bottom = region
+            if right - left < template_width or bottom - top < template_height:
+                logger.debug(f"template larger than its window: {each_template_name}")
+                continue
+            template_region_dict[each_template_name] = region
+
+        # templates without windows will be searched in the whole target
+        result = self._find_with_template(
             target_pic_object,
-            target_pic_name=target_pic_name,
-            target_pic_path=target_pic_path,
+            template_region_dict=template_region_dict,
             *args,
             **kwargs,
         )
-        return {
-            "target_name": target_pic_name,
-            "target_path": target_pic_path,
-            "data": result,
-        }
+
+        # missing in windows (or worse than before), try again in the whole target
+        missing_name_list = list()
+        for each_template_name in template_region_dict:
+            each_hit = self._get_track_hit(result[each_template_name], sim_threshold)
+            _, last_sim = last_hit_dict[each_template_name]
+            if each_hit is None or (
+                each_hit[1] is not None
+                and last_sim is not None
+                and each_hit[1] < last_sim - sim_drop
+            ):
+                missing_name_list.append(each_template_name)
+        if missing_name_list:
+            logger.debug(f"missing in windows: {missing_name_list}")
+            result.update(
+                self._find_with_template(
+                    target_pic_object,
+                    template_name_list=missing_name_list,
+                    *args,
+                    **kwargs,
+                )
+            )
+        return result
+
+    @staticmethod
+    def _get_track_hit(
+        template_result: dict, sim_threshold: float
+    ) -> typing.Optional[typing.Tuple[typing.Sequence, typing.Optional[float]]]:
+        """ (position, sim) from the first engine which found the template, or None """
+        for each_engine_result in template_result.values():
+            if not each_engine_result.get("ok"):
+                continue
+            each_sim = each_engine_result.get("target_sim")
+            if each_sim is not None and each_sim < sim_threshold:
+                continue
+            if "target_point" in each_engine_result:
+                return each_engine_result["target_point"], each_sim
+        return None
 
     def _find_without_template(
         self,
         target_pic_object: np.ndarray,
         target_pic_name: str = None,
+        timing_dict: dict = None,
         *args,
         **kwargs,
     ) -> dict:
@@ -200,10 +779,17 @@ class FindIt(object):
 
         current_result = dict()
         for each_engine in self.engine_list:
-            each_result = each_engine.execute(None, target_pic_object, *args, **kwargs)
+            each_timer = get_timer(self.timing)
+            each_result = each_engine.execute(
+                None, target_pic_object, timer=each_timer, *args, **kwargs
+            )
+            if timing_dict is not None:
+                timing_dict.setdefault(target_pic_name, dict())[
+                    each_engine.get_type()
+                ] = each_timer.get_dict()
 
             # result filter
-            each_result = self._prune_result(each_result)
+            each_result = self._prune_result(each_result, kwargs.get("result_fields"))
             current_result[each_engine.get_type()] = each_result
 
         logger.debug(
@@ -212,51 +798,175 @@ class FindIt(object):
         return {target_pic_name: current_result}
 
     def _find_with_template(
-        self, target_pic_object: np.ndarray, _mark_pic: bool = None, *args, **kwargs
+        self,
+        target_pic_object: np.ndarray,
+        _mark_pic: bool = None,
+        template_region_dict: typing.Dict[str, typing.Sequence] = None,
+        template_name_list: typing.Sequence[str] = None,
+        timing_dict: dict = None,
+        *args,
+        **kwargs,
     ) -> dict:
         # pre assert
         assert not self.template.is_empty(), "template is empty"
 
-        result = dict()
-        for each_template_name, each_template_object in self.template.load():
-            logger.debug(f"start analysing: [{each_template_name}] ...")
+        # every (template, engine) pair is a task
+        template_list = list(self.template.load())
+        if template_name_list is not None:
+            template_list = [
+                each for each in template_list if each[0] in template_name_list
+            ]
+        # masks, decoded
+        mask_dict: typing.Dict[str, np.ndarray] = dict()
+        for each_template_name, _ in template_list:
+            each_mask = self.template.get_mask(each_template_name)
+            if each_mask is not None:
+                mask_dict[each_template_name] = each_mask
+        task_list = [
+            (each_template_name, each_template_object, each_engine)
+            for each_template_name, each_template_object in template_list
+            for each_engine in self.engine_list
+        ]
+
+        # search regions (views of target, no copy)
+        # templates with the same region share the same view (and things derived from it)
+        template_region_dict = template_region_dict or dict()
+        decode_reduce = round(1 / kwargs.get("target_scale", 1.0))
+        view_dict: typing.Dict[typing.Sequence, np.ndarray] = dict()
+        template_view_dict: typing.Dict[str, typing.Tuple[np.ndarray, tuple]] = dict()
+        for each_template_name, _ in template_list:
+            region = template_region_dict.get(
+                each_template_name, self.template.get_region(each_template_name)
+            )
+            if region is None:
+                continue
+            # regions are in the original target, which may be larger
+            region = toolbox.get_region(
+                [each * decode_reduce for each in target_pic_object.shape[:2]], region
+            )
+            region = tuple(each // decode_reduce for each in region)
+            if region not in view_dict:
+                view_dict[region] = toolbox.crop_view(target_pic_object, region)
+            template_view_dict[each_template_name] = (view_dict[region], region)
+
+        def _execute(task: typing.Tuple) -> typing.Tuple[dict, dict]:
+            each_template_name, each_template_object, each_engine = task
+            each_target_pic_object, region = template_view_dict.get(
+                each_template_name, (target_pic_object, None)
+            )
+            each_timer = get_timer(self.timing)
+            each_kwargs = kwargs
+            # mask from load_template, unless there is one in kwargs
+            if each_template_name in mask_dict and not (
+                kwargs.get("engine_template_mask_pic_object") is not None
+                or kwargs.get("engine_template_mask_pic_path") is not None
+            ):
+                each_kwargs = {
+                    **kwargs,
+                    "engine_template_mask_pic_object": mask_dict[each_template_name],
+                }
+            each_result = each_engine.execute(
+                each_template_object,
+                each_target_pic_object,
+                executor=self.executor,
+                timer=each_timer,
+                *args,
+                # size of executor (not the one in kwargs, which is for __init__)
+                **{**each_kwargs, "worker_num": self.worker_num},
+            )
+            # map to the whole target
+            if region is not None:
+                each_engine.shift_response(
+                    each_result, region[0] * decode_reduce, region[1] * decode_reduce
+                )
 
-            # todo lazy load
-            current_result = dict()
-            for each_engine in self.engine_list:
-                each_result = each_engine.execute(
-                    each_template_object, target_pic_object, *args, **kwargs
+            # for debug ONLY!
+            if _mark_pic:
+                target_pic_object_with_mark = toolbox.mark_point(
+                    target_pic_object, each_result["target_point"], cover=False
+                )
+                temp_pic_path = toolbox.debug_cv_object(target_pic_object_with_mark)
+                logger.debug(
+                    f"template: {each_template_name}, "
+                    f"engine: {each_engine.get_type()}, "
+                    f"path: {temp_pic_path}"
                 )
 
-                # for debug ONLY!
-                if _mark_pic:
-                    target_pic_object_with_mark = toolbox.mark_point(
-                        target_pic_object, each_result["target_point"], cover=False
-                    )
-                    temp_pic_path = toolbox.debug_cv_object(target_pic_object_with_mark)
-                    logger.debug(
-                        f"template: {each_template_name}, "
-                        f"engine: {each_engine.get_type()}, "
-                        f"path: {temp_pic_path}"
-                    )
+            # result filter
+            return (
+                self._prune_result(each_result, kwargs.get("result_fields")),
+                each_timer.get_dict(),
+            )
 
-                # result filter
-                each_result = self._prune_result(each_result)
+        # merged in order, whether executor existed or not
+        result = dict()
+        for task, (each_result, each_timing) in zip(
+            task_list, toolbox.parallel_map(_execute, task_list, self.executor)
+        ):
+            each_template_name, _, each_engine = task
+            current_result = result.setdefault(each_template_name, dict())
+            current_result[each_engine.get_type()] = each_result
+            if timing_dict is not None:
+                timing_dict.setdefault(each_template_name, dict())[
+                    each_engine.get_type()
+                ] = each_timing
 
-                current_result[each_engine.get_type()] = each_result
+        for each_template_name, current_result in result.items():
             logger.debug(
                 f"result for [{each_template_name}]: {json.dumps(current_result, default=lambda x: x.__dict__)}"
             )
-            result[each_template_name] = current_result
-
         return result
 
-    def _prune_result(self, response: FindItEngineResponse) -> dict:
+    def _prune_result(
+        self, response: FindItEngineResponse, result_fields: typing.Sequence[str] = None
+    ) -> dict:
         if self.pro_mode:
-            return response.get_content()
-        return response.get_brief()
+            result = response.get_content()
+        else:
+            result = response.get_brief()
+        # engines may not support result_fields
+        if result_fields:
+            result = {k: v for k, v in result.items() if k in result_fields}
+        return result
 
     def clear(self):
         """ reset template, target and result """
-        self.template = dict()
+        self.template.reset()
         logger.info("findit clear successfully")
+
+
+# for find_many
+# findit of current worker process, built once in initializer
+_worker_findit: typing.Optional[FindIt] = None
+
+
+def _get_pic_hash(pic_object: np.ndarray) -> str:
+    """ content hash, computed once for each picture """
+    return derive(
+        pic_object, "content_hash", lambda: toolbox.get_content_hash(pic_object)
+    )
+
+
+def _init_worker(init_kwargs: dict, template_list: typing.List[typing.Tuple]):
+    global _worker_findit
+    _worker_findit = FindIt(**init_kwargs)
+    for pic_name, pic_object, region, mask_pic_object in template_list:
+        _worker_findit.load_template(
+            pic_name,
+            pic_object=pic_object,
+            region=region,
+            mask_pic_object=mask_pic_object,
+        )
+
+
+def _find_in_worker(
+    target_id: int, target: typing.Union[str, np.ndarray], kwargs: dict
+) -> dict:
+    if isinstance(target, str):
+        result = _worker_findit.find(target, target_pic_path=target, **kwargs)
+    else:
+        result = _worker_findit.find(
+            f"target_{target_id}", target_pic_object=target, **kwargs
+        )
+    result["target_id"] = target_id
+    return result
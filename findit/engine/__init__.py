@@ -1,13 +1,122 @@
-from findit.engine.feature import FeatureEngine
-from findit.engine.template import TemplateEngine
-from findit.engine.ocr import OCREngine
-from findit.engine.sim import SimEngine
+import importlib
+import typing
+import collections.abc
 
+from findit.logger import logger
 from findit.engine.base import FindItEngineResponse, FindItEngine
 
-engine_dict = {
-    "feature": FeatureEngine,
-    "template": TemplateEngine,
-    "ocr": OCREngine,
-    "sim": SimEngine,
+# third-party engines can be registered with entry points in this group, eg:
+# entry_points={"findit.engine": ["my_engine = my_package.my_module:MyEngine"]}
+ENTRY_POINT_GROUP = "findit.engine"
+
+# built-in engines, imported only when used
+_BUILTIN_ENGINE_PATH_DICT = {
+    "feature": "findit.engine.feature:FeatureEngine",
+    "template": "findit.engine.template:TemplateEngine",
+    "ocr": "findit.engine.ocr:OCREngine",
+    "sim": "findit.engine.sim:SimEngine",
 }
+
+
+def _import_from_path(path: str) -> typing.Type[FindItEngine]:
+    """ 'package.module:ClassName' -> ClassName """
+    module_name, class_name = path.split(":")
+    return getattr(importlib.import_module(module_name), class_name)
+
+
+def _select_entry_points(all_entry_points, group: str) -> typing.Iterable:
+    """ entry_points() returns a dict (python 3.8, 3.9), or EntryPoints with select (3.10+, importlib_metadata) """
+    if hasattr(all_entry_points, "select"):
+        return all_entry_points.select(group=group)
+    return all_entry_points.get(group, [])
+
+
+def _iter_entry_points(group: str) -> typing.Iterable[typing.Tuple[str, str]]:
+    """ (name, 'package.module:ClassName') of entry points in this group """
+    try:
+        from importlib.metadata import entry_points
+    except ImportError:
+        # python 3.7
+        try:
+            from importlib_metadata import entry_points
+        except ImportError:
+            entry_points = None
+
+    if entry_points is not None:
+        for each in _select_entry_points(entry_points(), group):
+            yield each.name, each.value
+        return
+
+    try:
+        import pkg_resources
+    except ImportError:
+        logger.warning(
+            "neither importlib_metadata nor pkg_resources is available, engines from entry points are disabled"
+        )
+        return
+    for each in pkg_resources.iter_entry_points(group):
+        yield each.name, f"{each.module_name}:{'.'.join(each.attrs)}"
+
+
+class _EngineRegistry(collections.abc.Mapping):
+    """
+    engine name -> engine class.
+
+    engine modules (and their heavy dependencies, eg: findtext) will not be imported until used.
+    """
+
+    def __init__(self, path_dict: typing.Dict[str, str]):
+        # value: engine class, or its import path
+        self._engine_dict: typing.Dict[
+            str, typing.Union[str, typing.Type[FindItEngine]]
+        ] = dict(path_dict)
+        self._entry_point_loaded = False
+
+    def register(
+        self, name: str, engine: typing.Union[str, typing.Type[FindItEngine]]
+    ):
+        """ register an engine class, or its import path ('package.module:ClassName') """
+        self._engine_dict[name] = engine
+
+    def _load_entry_points(self):
+        if self._entry_point_loaded:
+            return
+        self._entry_point_loaded = True
+
+        for name, path in _iter_entry_points(ENTRY_POINT_GROUP):
+            # built-in and registered ones first
+            if name not in self._engine_dict:
+                logger.debug(f"engine from entry point: {name} -> {path}")
+                self._engine_dict[name] = path
+
+    def __getitem__(self, name: str) -> typing.Type[FindItEngine]:
+        if name not in self._engine_dict:
+            self._load_entry_points()
+        engine = self._engine_dict[name]
+        if isinstance(engine, str):
+            engine = _import_from_path(engine)
+            self._engine_dict[name] = engine
+        return engine
+
+    def __iter__(self):
+        self._load_entry_points()
+        return iter(self._engine_dict)
+
+    def __len__(self):
+        self._load_entry_points()
+        return len(self._engine_dict)
+
+
+engine_dict = _EngineRegistry(_BUILTIN_ENGINE_PATH_DICT)
+register_engine = engine_dict.register
+
+_BUILTIN_ENGINE_NAME_DICT = {
+    path.split(":")[1]: path for path in _BUILTIN_ENGINE_PATH_DICT.values()
+}
+
+
+def __getattr__(name: str):
+    """ `from findit.engine import TemplateEngine` still works, but lazily """
+    if name in _BUILTIN_ENGINE_NAME_DICT:
+        return _import_from_path(_BUILTIN_ENGINE_NAME_DICT[name])
+    raise AttributeError(f"module {__name__} has no attribute {name}")
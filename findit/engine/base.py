@@ -1,9 +1,31 @@
+import copy
+import typing
+
+from findit import toolbox
+from findit.timer import Timer, NULL_TIMER
+
+
 class FindItEngineResponse(object):
     """ standard response for engine """
 
-    def __init__(self):
+    def __init__(self, fields: typing.Iterable[str] = None, timer: Timer = None):
+        """
+        :param fields: keep these keys only (eg: ['target_point', 'target_sim']), all by default
+        :param timer: costs of stages, will be added to content as 'timing'. no timing if None
+        """
         self._content = dict()
         self._brief = dict()
+        self._fields: typing.Optional[typing.Set[str]] = set(fields) if fields else None
+        self.timer: Timer = timer or NULL_TIMER
+
+    def want(self, key) -> bool:
+        """ check it before building expensive values (eg: conf and raw) """
+        return (self._fields is None) or (key in self._fields)
+
+    def _select(self, value_dict: dict) -> dict:
+        if self._fields is None:
+            return value_dict
+        return {k: v for k, v in value_dict.items() if k in self._fields}
 
     def append(self, key, value, important: bool = None):
         if important:
@@ -11,16 +33,78 @@ class FindItEngineResponse(object):
         self._content[key] = value
 
     def get_brief(self) -> dict:
-        return self._brief
+        return self._select(self._brief)
 
     def get_content(self) -> dict:
-        return self._content
+        content = self._select(self._content)
+        if self.timer and self.want("timing"):
+            content = {**content, "timing": self.timer.get_dict()}
+        return content
+
+    def update(self, key, value):
+        """ replace existed value, keep its importance """
+        if key in self._brief:
+            self._brief[key] = value
+        self._content[key] = value
+
+    def get(self, key, default=None):
+        """ whether selected or not """
+        return self._content.get(key, default)
+
+    def __getitem__(self, key):
+        return self._content[key]
 
 
 class FindItEngine(object):
+    """
+    base class of engines.
+
+    an engine is configured in __init__ only, and execute should never change it:
+    options of one call (eg: engine_ocr_deep) are kept in that call,
+    and anything built in execute (eg: caches) must be thread-safe.
+    so one engine can be shared by threads.
+    """
+
     def get_type(self):
         return self.__class__.__name__
 
+    def get_conf(self) -> dict:
+        """
+        public config of engine, private members (eg: caches) are not JSON serializable.
+        it is a copy, changing it will not change the engine.
+        """
+        return copy.deepcopy(
+            {k: v for k, v in self.__dict__.items() if not k.startswith("_")}
+        )
+
+    def get_min_target_scale(self) -> float:
+        """
+        the lowest resolution of target (fraction of the original size) which this engine works with.
+        if all the engines allow, targets may be decoded smaller (cheaper), see toolbox.load_grey.
+        engines which return less than 1 should handle target_scale in execute.
+        """
+        return 1.0
+
+    def get_max_template_scale(self) -> float:
+        """
+        the largest size of template (multiple of its original size, in the original target) which this engine matches.
+        search windows (eg: in FindIt.track) should be larger than it.
+        """
+        return 1.0
+
+    def shift_response(
+        self, resp: FindItEngineResponse, offset_x: float, offset_y: float
+    ):
+        """
+        move points in response, if the target is a part (view) of the whole picture.
+        override it if your response contains more points than 'target_point'.
+        """
+        if resp.get("ok") and resp.get("target_point") is not None:
+            resp.update(
+                "target_point",
+                toolbox.shift_point(resp["target_point"], offset_x, offset_y),
+            )
+
     def execute(self, *_, **__) -> FindItEngineResponse:
         """ MUST BE IMPLEMENTED """
         raise NotImplementedError("this function must be implemented")
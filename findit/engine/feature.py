@@ -2,12 +2,13 @@ import numpy as np
 import typing
 import cv2
 import collections
-
-# https://scikit-learn.org/stable/modules/generated/sklearn.cluster.KMeans.html
-from sklearn.cluster import KMeans
+import threading
 
 from findit.logger import logger
+from findit import toolbox
 from findit.toolbox import Point
+from findit.cache import derive
+from findit.timer import Timer, NULL_TIMER
 from findit.engine.base import FindItEngine, FindItEngineResponse
 
 
@@ -18,12 +19,19 @@ class FeatureEngine(FindItEngine):
     DEFAULT_DISTANCE_THRESHOLD: float = 0.9
     # higher -> less
     DEFAULT_MIN_HESSIAN: int = 200
+    # 'numpy' (built-in, fast) or 'sklearn'
+    DEFAULT_CLUSTER_METHOD: str = "numpy"
+    # for numpy kmeans
+    KMEANS_SEED: int = 0
+    KMEANS_INIT_NUM: int = 4
+    KMEANS_MAX_ITER: int = 100
 
     def __init__(
         self,
         engine_feature_cluster_num: int = None,
         engine_feature_distance_threshold: float = None,
         engine_feature_min_hessian: int = None,
+        engine_feature_cluster_method: str = None,
         *_,
         **__,
     ):
@@ -37,18 +45,38 @@ class FeatureEngine(FindItEngine):
         # higher threshold, less points
         self.engine_feature_min_hessian: int = engine_feature_min_hessian or self.DEFAULT_MIN_HESSIAN
 
+        # kmeans implementation
+        self.engine_feature_cluster_method: str = engine_feature_cluster_method or self.DEFAULT_CLUSTER_METHOD
+        assert self.engine_feature_cluster_method in (
+            "numpy",
+            "sklearn",
+        ), f"unknown cluster method: {self.engine_feature_cluster_method}"
+
+        # detector and matcher are reused, one for each thread
+        self._local = threading.local()
+
         logger.debug(f"cluster num: {self.engine_feature_cluster_num}")
         logger.debug(f"distance threshold: {self.engine_feature_distance_threshold}")
         logger.debug(f"hessian threshold: {self.engine_feature_min_hessian}")
+        logger.debug(f"cluster method: {self.engine_feature_cluster_method}")
         logger.info(f"engine {self.get_type()} loaded")
 
     def execute(
-        self, template_object: np.ndarray, target_object: np.ndarray, *_, **__
+        self,
+        template_object: np.ndarray,
+        target_object: np.ndarray,
+        result_fields: typing.Iterable[str] = None,
+        timer: Timer = None,
+        *_,
+        **__,
     ) -> FindItEngineResponse:
-        resp = FindItEngineResponse()
-        resp.append("conf", self.__dict__)
+        resp = FindItEngineResponse(result_fields, timer)
+        if resp.want("conf"):
+            resp.append("conf", self.get_conf())
 
-        point_list = self.get_feature_point_list(template_object, target_object)
+        point_list = self.get_feature_point_list(
+            template_object, target_object, resp.timer
+        )
 
         # no point found
         if not point_list:
@@ -57,7 +85,8 @@ class FeatureEngine(FindItEngine):
             resp.append("ok", False, important=True)
             return resp
 
-        center_point = self.calculate_center_point(point_list)
+        with resp.timer.stage("cluster"):
+            center_point = self.calculate_center_point(point_list)
 
         readable_center_point = list(center_point)
         readable_point_list = [list(each) for each in point_list]
@@ -68,32 +97,44 @@ class FeatureEngine(FindItEngine):
         resp.append("ok", True, important=True)
         return resp
 
+    def shift_response(
+        self, resp: FindItEngineResponse, offset_x: float, offset_y: float
+    ):
+        super(FeatureEngine, self).shift_response(resp, offset_x, offset_y)
+        if resp.get("ok") and resp.get("raw") is not None:
+            resp.update(
+                "raw",
+                [toolbox.shift_point(each, offset_x, offset_y) for each in resp["raw"]],
+            )
+
     def get_feature_point_list(
-        self, template_pic_object: np.ndarray, target_pic_object: np.ndarray
+        self,
+        template_pic_object: np.ndarray,
+        target_pic_object: np.ndarray,
+        timer: Timer = NULL_TIMER,
     ) -> typing.Sequence[Point]:
         """
         compare via feature matching
 
         :param template_pic_object:
         :param target_pic_object:
+        :param timer: costs of stages
         :return:
         """
-        # IMPORTANT
-        # sift and surf can not be used in python >= 3.8
-        # so we switch it to ORB detector
-        # maybe not enough precisely now
-
-        # Initiate ORB detector
-        orb = cv2.ORB_create()
-
-        # find the keypoints and descriptors with ORB
-        template_kp, template_desc = orb.detectAndCompute(template_pic_object, None)
-        target_kp, target_desc = orb.detectAndCompute(target_pic_object, None)
+        # keypoints and descriptors of template are cached with template,
+        # and target's are computed once and shared by all the templates.
+        with timer.stage("orb"):
+            template_kp, template_desc = self.get_feature(template_pic_object)
+            target_kp, target_desc = self.get_feature(target_pic_object)
 
         # key points count
         logger.debug(f"template key point count: {len(template_kp)}")
         logger.debug(f"target key point count: {len(target_kp)}")
 
+        # no feature point
+        if template_desc is None or target_desc is None:
+            return list()
+
         # find 2 points, which are the closest
         # 找到帧和帧之间的一致性的过程就是在一个描述符集合（询问集）中找另一个集合（相当于训练集）的最近邻。 这里找到 每个描述符 的 最近邻与次近邻
         # 一个正确的匹配会更接近第一个邻居。换句话说，一个不正确的匹配，两个邻居的距离是相似的。因此，我们可以通过查看二者距离的不同来评判距匹配程度的好坏。
@@ -101,9 +142,10 @@ class FeatureEngine(FindItEngine):
         # flann = cv2.FlannBasedMatcher()
         # matches = flann.knnMatch(template_desc, target_desc, k=2)
 
-        bf = cv2.BFMatcher(cv2.NORM_HAMMING, crossCheck=True)
+        bf = self._get_matcher()
         # 特征描述子匹配
-        matches = bf.knnMatch(template_desc, target_desc, k=1)
+        with timer.stage("match"):
+            matches = bf.knnMatch(template_desc, target_desc, k=1)
 
         # matches are something like:
         # [[<DMatch 0x12400a350>, <DMatch 0x12400a430>], [<DMatch 0x124d6a170>, <DMatch 0x124d6a450>]]
@@ -123,11 +165,36 @@ class FeatureEngine(FindItEngine):
         point_list = list()
         for each in good:
             target_idx = each.trainIdx
-            each_point = Point(*target_kp[target_idx].pt)
+            each_point = Point(*target_kp[target_idx].tolist())
             point_list.append(each_point)
 
         return point_list
 
+    def get_feature(
+        self, pic_object: np.ndarray
+    ) -> typing.Tuple[np.ndarray, typing.Optional[np.ndarray]]:
+        """ ORB keypoints (positions only) and descriptors of picture, computed once for each picture """
+
+        def _compute():
+            kp, desc = self._get_detector().detectAndCompute(pic_object, None)
+            return np.array([each.pt for each in kp]).reshape(-1, 2), desc
+
+        return derive(pic_object, "orb", _compute)
+
+    def _get_detector(self) -> cv2.ORB:
+        # IMPORTANT
+        # sift and surf can not be used in python >= 3.8
+        # so we switch it to ORB detector
+        # maybe not enough precisely now
+        if not hasattr(self._local, "detector"):
+            self._local.detector = cv2.ORB_create()
+        return self._local.detector
+
+    def _get_matcher(self) -> cv2.BFMatcher:
+        if not hasattr(self._local, "matcher"):
+            self._local.matcher = cv2.BFMatcher(cv2.NORM_HAMMING, crossCheck=True)
+        return self._local.matcher
+
     def calculate_center_point(self, point_list: typing.Sequence[Point]) -> Point:
         np_point_list = np.array(point_list)
         point_num = len(np_point_list)
@@ -138,8 +205,60 @@ class FeatureEngine(FindItEngine):
         else:
             cluster_num = self.engine_feature_cluster_num
 
-        k_means = KMeans(n_clusters=cluster_num).fit(np_point_list)
+        if self.engine_feature_cluster_method == "sklearn":
+            # https://scikit-learn.org/stable/modules/generated/sklearn.cluster.KMeans.html
+            from sklearn.cluster import KMeans
+
+            k_means = KMeans(n_clusters=cluster_num).fit(np_point_list)
+            labels, centers = k_means.labels_, k_means.cluster_centers_
+        else:
+            labels, centers = self._kmeans(np_point_list, cluster_num)
+
         mode_label_index = sorted(
-            collections.Counter(k_means.labels_).items(), key=lambda x: x[1]
+            collections.Counter(labels).items(), key=lambda x: x[1]
         )[-1][0]
-        return Point(*k_means.cluster_centers_[mode_label_index])
+        return Point(*centers[mode_label_index].tolist())
+
+    def _kmeans(
+        self, point_array: np.ndarray, cluster_num: int
+    ) -> typing.Tuple[np.ndarray, np.ndarray]:
+        """ vectorized kmeans (kmeans++ init, fixed seed), returns labels and centers """
+        point_array = point_array.astype(np.float64)
+        rng = np.random.default_rng(self.KMEANS_SEED)
+
+        best = None
+        for _ in range(self.KMEANS_INIT_NUM):
+            # kmeans++
+            centers = point_array[[rng.integers(len(point_array))]]
+            while len(centers) < cluster_num:
+                distance = np.min(
+                    np.sum((point_array[:, None] - centers[None]) ** 2, axis=2), axis=1
+                )
+                total = distance.sum()
+                # all the points are covered already
+                if not total:
+                    index = rng.integers(len(point_array))
+                else:
+                    index = rng.choice(len(point_array), p=distance / total)
+                centers = np.vstack([centers, point_array[index]])
+
+            # lloyd
+            for _ in range(self.KMEANS_MAX_ITER):
+                distance = np.sum((point_array[:, None] - centers[None]) ** 2, axis=2)
+                labels = np.argmin(distance, axis=1)
+                new_centers = np.array(
+                    [
+                        point_array[labels == i].mean(axis=0)
+                        if np.any(labels == i)
+                        else centers[i]
+                        for i in range(cluster_num)
+                    ]
+                )
+                if np.allclose(new_centers, centers):
+                    break
+                centers = new_centers
+
+            inertia = np.sum(distance[np.arange(len(point_array)), labels])
+            if best is None or inertia < best[0]:
+                best = (inertia, labels, centers)
+        return best[1], best[2]
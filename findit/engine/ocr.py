@@ -1,14 +1,85 @@
+import concurrent.futures
+import multiprocessing
+import threading
+import weakref
 import numpy as np
 import warnings
 import typing
 
 from findit.logger import logger
+from findit import toolbox
+from findit.timer import Timer
+from findit.cache import LRUCache
 from findit.engine.base import FindItEngine, FindItEngineResponse
 
 try:
     import findtext
 except ImportError:
     logger.debug("findtext should be installed if you want to use OCR engine")
+    findtext = None
+
+# findtext object of worker process, with its own tesseract
+_worker_ft = None
+
+
+def _init_worker(lang: str):
+    global _worker_ft
+    _worker_ft = findtext.FindText(lang=lang)
+
+
+def _find_word_in_worker(
+    image_object: np.ndarray, deep: bool, offset: int
+) -> typing.List:
+    return _worker_ft.find_word(image_object=image_object, deep=deep, offset=offset)
+
+
+def get_tile_list(
+    height: int, tile_height: int, overlap: int
+) -> typing.List[typing.Tuple[int, int, int, int]]:
+    """
+    split picture into overlapping horizontal tiles (full width, text lines are not cut by vertical seams)
+
+    :param height: height of picture
+    :param tile_height: height of each tile (without overlap)
+    :param overlap: extra rows shared by neighbour tiles, should be higher than text lines
+    :return: (start, end, keep start, keep end) of each tile. words whose centers are in [keep start, keep end) belong to it
+    """
+    tile_list = list()
+    for keep_start in range(0, height, tile_height):
+        keep_end = min(keep_start + tile_height, height)
+        tile_list.append(
+            (
+                max(keep_start - overlap, 0),
+                min(keep_end + overlap, height),
+                keep_start,
+                keep_end,
+            )
+        )
+    return tile_list
+
+
+def merge_tile_result(
+    tile_list: typing.Sequence[typing.Tuple[int, int, int, int]],
+    word_block_list_of_tiles: typing.Sequence[typing.Sequence],
+) -> typing.List:
+    """
+    move word blocks of tiles to the whole picture, and drop duplicates across seams.
+    every word is kept by the only tile which owns its center.
+    """
+    result = list()
+    for (start, _, keep_start, keep_end), word_block_list in zip(
+        tile_list, word_block_list_of_tiles
+    ):
+        for each in word_block_list:
+            box = dict(each.box, y=each.box["y"] + start)
+            center_y = box["y"] + box["h"] / 2
+            if not keep_start <= center_y < keep_end:
+                continue
+            # update_box does not change box
+            each.box = box
+            each.update_box(box)
+            result.append(each)
+    return result
 
 
 class OCREngine(FindItEngine):
@@ -21,8 +92,25 @@ class OCREngine(FindItEngine):
     DEFAULT_OFFSET: int = 0
     # deep query
     DEFAULT_DEEP: bool = False
+    # results of recent pictures, same picture (content) will not be recognized twice
+    DEFAULT_CACHE_SIZE: int = 32
+    # large pictures are split into tiles, and recognized in worker processes
+    # 1 means no worker, and no tile
+    DEFAULT_PROCESS_NUM: int = 1
+    DEFAULT_TILE_HEIGHT: int = 512
+    # rows shared by neighbour tiles, should be higher than text lines
+    DEFAULT_TILE_OVERLAP: int = 64
 
-    def __init__(self, engine_ocr_lang: str = None, *_, **__):
+    def __init__(
+        self,
+        engine_ocr_lang: str = None,
+        engine_ocr_cache_size: int = None,
+        engine_ocr_process_num: int = None,
+        engine_ocr_tile_height: int = None,
+        engine_ocr_tile_overlap: int = None,
+        *_,
+        **__,
+    ):
         logger.info(f"engine {self.get_type()} preparing ...")
 
         # check language data before execute function, not here.
@@ -30,6 +118,19 @@ class OCREngine(FindItEngine):
         self.engine_ocr_offset = self.DEFAULT_OFFSET
         self.engine_ocr_deep = self.DEFAULT_DEEP
 
+        self.engine_ocr_cache_size = engine_ocr_cache_size or self.DEFAULT_CACHE_SIZE
+        self.engine_ocr_process_num = engine_ocr_process_num or self.DEFAULT_PROCESS_NUM
+        self.engine_ocr_tile_height = engine_ocr_tile_height or self.DEFAULT_TILE_HEIGHT
+        self.engine_ocr_tile_overlap = (
+            engine_ocr_tile_overlap or self.DEFAULT_TILE_OVERLAP
+        )
+
+        # content hash, lang, deep, offset -> word blocks
+        self._cache = LRUCache(max_size=self.engine_ocr_cache_size)
+        # created when the first large picture comes
+        self._executor: typing.Optional[concurrent.futures.ProcessPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+
         assert findtext, "findtext should be installed if you want to use OCR engine"
         self._ft = findtext.FindText(lang=engine_ocr_lang)
 
@@ -39,6 +140,8 @@ class OCREngine(FindItEngine):
         logger.debug(f"target lang: {self.engine_ocr_lang}")
         logger.debug(f"tess data dir: {self.engine_ocr_tess_data_dir}")
         logger.debug(f"available language: {self.engine_ocr_available_lang_list}")
+        logger.debug(f"cache size: {self.engine_ocr_cache_size}")
+        logger.debug(f"process num: {self.engine_ocr_process_num}")
         logger.info(f"engine {self.get_type()} loaded")
 
     def execute(
@@ -47,19 +150,25 @@ class OCREngine(FindItEngine):
         target_object: np.ndarray,
         engine_ocr_offset: int = None,
         engine_ocr_deep: bool = None,
+        result_fields: typing.Iterable[str] = None,
+        timer: Timer = None,
         *_,
         **__,
     ) -> FindItEngineResponse:
-        resp = FindItEngineResponse()
+        resp = FindItEngineResponse(result_fields, timer)
 
-        if engine_ocr_offset:
-            self.engine_ocr_offset = engine_ocr_offset
-        if engine_ocr_deep:
-            self.engine_ocr_deep = engine_ocr_deep
+        # options of this call only, engine itself is not changed
+        if engine_ocr_offset is None:
+            engine_ocr_offset = self.engine_ocr_offset
+        if engine_ocr_deep is None:
+            engine_ocr_deep = self.engine_ocr_deep
 
-        # _ft is not JSON serializable
-        conf_dict = {k: _ for k, _ in self.__dict__.items() if k != "_ft"}
-        resp.append("conf", conf_dict, important=True)
+        if resp.want("conf"):
+            conf_dict = self.get_conf()
+            conf_dict.update(
+                engine_ocr_offset=engine_ocr_offset, engine_ocr_deep=engine_ocr_deep
+            )
+            resp.append("conf", conf_dict, important=True)
 
         # check language
         for each_lang in self.engine_ocr_lang.split("+"):
@@ -68,11 +177,20 @@ class OCREngine(FindItEngine):
                 resp.append("ok", False, important=True)
                 return resp
 
-        word_block_list = self._ft.find_word(
-            image_object=target_object,
-            deep=self.engine_ocr_deep,
-            offset=self.engine_ocr_offset,
-        )
+        with resp.timer.stage("hash"):
+            cache_key = (
+                toolbox.get_content_hash(target_object),
+                self.engine_ocr_lang,
+                engine_ocr_deep,
+                engine_ocr_offset,
+            )
+        word_block_list = self._cache.get(cache_key)
+        if word_block_list is None:
+            with resp.timer.stage("ocr"):
+                word_block_list = self.find_word(
+                    target_object, engine_ocr_deep, engine_ocr_offset
+                )
+            self._cache.put(cache_key, word_block_list)
 
         available_result_list = [i for i in word_block_list if i.content]
         result_text = self._improve_text_result(
@@ -80,10 +198,59 @@ class OCREngine(FindItEngine):
         )
 
         resp.append("content", result_text, important=True)
-        resp.append("raw", [i.__dict__ for i in word_block_list])
+        if resp.want("raw"):
+            # word blocks are cached, copy them
+            resp.append("raw", [dict(i.__dict__) for i in word_block_list])
         resp.append("ok", True, important=True)
         return resp
 
+    def find_word(
+        self, pic_object: np.ndarray, deep: bool, offset: int
+    ) -> typing.Tuple:
+        """
+        recognize words of the whole picture.
+        large picture will be split into overlapping tiles, and recognized concurrently.
+
+        :param pic_object: grey picture
+        :param deep: findtext's deep query
+        :param offset: findtext's offset
+        :return: word blocks, should not be modified (they are cached)
+        """
+        height = pic_object.shape[0]
+        if (
+            self.engine_ocr_process_num <= 1
+            or height <= self.engine_ocr_tile_height + self.engine_ocr_tile_overlap
+        ):
+            return tuple(
+                self._ft.find_word(image_object=pic_object, deep=deep, offset=offset)
+            )
+
+        tile_list = get_tile_list(
+            height, self.engine_ocr_tile_height, self.engine_ocr_tile_overlap
+        )
+        logger.debug(f"recognize in {len(tile_list)} tiles")
+        executor = self._get_executor()
+        future_list = [
+            executor.submit(_find_word_in_worker, pic_object[start:end], deep, offset)
+            for start, end, *_ in tile_list
+        ]
+        return tuple(
+            merge_tile_result(tile_list, [each.result() for each in future_list])
+        )
+
+    def _get_executor(self) -> concurrent.futures.ProcessPoolExecutor:
+        with self._executor_lock:
+            if self._executor is None:
+                # spawn: forking a process with running threads is not safe
+                self._executor = concurrent.futures.ProcessPoolExecutor(
+                    max_workers=self.engine_ocr_process_num,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=(self.engine_ocr_lang,),
+                )
+                weakref.finalize(self, self._executor.shutdown, False)
+            return self._executor
+
     @staticmethod
     def _improve_text_result(origin: typing.List[str]) -> typing.List[str]:
         try:
@@ -1,16 +1,29 @@
 import numpy as np
 import cv2
-from skimage.metrics import structural_similarity
+import typing
 
 from findit.logger import logger
+from findit.timer import Timer, NULL_TIMER
+from findit.cache import derive
 from findit.engine.base import FindItEngine, FindItEngineResponse
 
 
 class SimEngine(FindItEngine):
-    """ Similarity engine """
+    """
+    Similarity engine
+
+    SSIM, same as skimage.metrics.structural_similarity with its default args
+    (7x7 uniform window, sample covariance, K1=0.01, K2=0.03, borders cropped).
+    local statistics of templates are computed once and cached with templates.
+    """
 
     DEFAULT_INTERPOLATION = cv2.INTER_CUBIC
 
+    # ssim args, same as skimage
+    WIN_SIZE: int = 7
+    K1: float = 0.01
+    K2: float = 0.03
+
     def __init__(self, engine_sim_interpolation: int = None, *_, **__):
         logger.info(f"engine {self.get_type()} preparing ...")
 
@@ -18,20 +31,109 @@ class SimEngine(FindItEngine):
             engine_sim_interpolation or self.DEFAULT_INTERPOLATION
         )
 
-        logger.debug(f"interpolation: {self.DEFAULT_INTERPOLATION}")
+        logger.debug(f"interpolation: {self.engine_sim_interpolation}")
         logger.info(f"engine {self.get_type()} loaded")
 
     def execute(
-        self, template_object: np.ndarray, target_object: np.ndarray, *_, **__
+        self,
+        template_object: np.ndarray,
+        target_object: np.ndarray,
+        result_fields: typing.Iterable[str] = None,
+        timer: Timer = None,
+        *_,
+        **__,
     ) -> FindItEngineResponse:
-        resp = FindItEngineResponse()
+        resp = FindItEngineResponse(result_fields, timer)
 
-        resized_target = cv2.resize(
-            target_object, template_object.shape[::-1], interpolation=cv2.INTER_CUBIC
-        )
-        ssim = structural_similarity(resized_target, template_object)
+        ssim = self.calculate_ssim([template_object], target_object, resp.timer)[0]
 
-        resp.append("conf", self.__dict__)
+        if resp.want("conf"):
+            resp.append("conf", self.get_conf())
         resp.append("ssim", ssim, important=True)
         resp.append("ok", True, important=True)
         return resp
+
+    def calculate_ssim(
+        self,
+        template_list: typing.Sequence[np.ndarray],
+        target_object: np.ndarray,
+        timer: Timer = NULL_TIMER,
+    ) -> typing.List[float]:
+        """
+        ssim between target (resized to the size of each template) and each template.
+        resized target (and its statistics) is computed once for each size, and shared by templates.
+        templates are scored one by one: stacking them into one numpy pass is slower than cv2.boxFilter
+
+        :param template_list: grey pictures
+        :param target_object: grey picture
+        :param timer: costs of stages
+        :return: ssim of each template, in order
+        """
+        result_list = list()
+        for each in template_list:
+            with timer.stage("resize"):
+                target_stat = self._get_target_stat(target_object, each.shape[:2])
+            with timer.stage("ssim"):
+                result_list.append(
+                    self._calculate_ssim(self._get_template_stat(each), target_stat)
+                )
+        return result_list
+
+    def _filter(self, pic_object: np.ndarray) -> np.ndarray:
+        """ local means """
+        # borders will be cropped, so border type does not matter
+        return cv2.boxFilter(
+            pic_object,
+            cv2.CV_64F,
+            (self.WIN_SIZE, self.WIN_SIZE),
+            borderType=cv2.BORDER_REFLECT,
+        )
+
+    def _get_stat(self, pic_object: np.ndarray) -> typing.Tuple[np.ndarray, ...]:
+        """ picture (float64), its local means and local variances """
+        pic_object = pic_object.astype(np.float64)
+        mean = self._filter(pic_object)
+        # sample covariance
+        cov_norm = self.WIN_SIZE ** 2 / (self.WIN_SIZE ** 2 - 1)
+        var = cov_norm * (self._filter(pic_object * pic_object) - mean * mean)
+        return pic_object, mean, var
+
+    def _get_template_stat(self, template_object: np.ndarray) -> tuple:
+        return derive(
+            template_object,
+            ("sim_stat", self.WIN_SIZE),
+            lambda: self._get_stat(template_object),
+        )
+
+    def _get_target_stat(self, target_object: np.ndarray, shape: tuple) -> tuple:
+        def _compute():
+            resized = cv2.resize(
+                target_object, shape[::-1], interpolation=self.engine_sim_interpolation
+            )
+            info = np.iinfo(target_object.dtype)
+            return (float(info.max - info.min),) + self._get_stat(resized)
+
+        return derive(
+            target_object,
+            ("sim_stat", self.WIN_SIZE, shape, self.engine_sim_interpolation),
+            _compute,
+        )
+
+    def _calculate_ssim(self, template_stat: tuple, target_stat: tuple) -> float:
+        template, template_mean, template_var = template_stat
+        data_range, target, target_mean, target_var = target_stat
+        c1 = (self.K1 * data_range) ** 2
+        c2 = (self.K2 * data_range) ** 2
+
+        # covariance is the only part which depends on both
+        cov_norm = self.WIN_SIZE ** 2 / (self.WIN_SIZE ** 2 - 1)
+        cov = cov_norm * (self._filter(template * target) - template_mean * target_mean)
+
+        ssim_map = ((2 * template_mean * target_mean + c1) * (2 * cov + c2)) / (
+            (template_mean ** 2 + target_mean ** 2 + c1)
+            * (template_var + target_var + c2)
+        )
+
+        # borders are affected by padding
+        pad = (self.WIN_SIZE - 1) // 2
+        return float(ssim_map[pad:-pad, pad:-pad].mean())
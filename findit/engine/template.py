@@ -1,9 +1,13 @@
 import numpy as np
 import typing
 import cv2
+import concurrent.futures
+import os
 
 from findit.logger import logger
 from findit import toolbox
+from findit.timer import Timer, NULL_TIMER
+from findit.cache import derive, get_uid, LRUCache
 from findit.engine.base import FindItEngine, FindItEngineResponse
 
 
@@ -18,9 +22,26 @@ class TemplateEngine(FindItEngine):
 
     DEFAULT_CV_METHOD_NAME: str = "cv2.TM_CCORR_NORMED"
     DEFAULT_SCALE: typing.Sequence = (1, 3, 10)
+    # same as np.linspace
+    DEFAULT_SCALE_NUM: int = 50
+    # 'linear' or 'adaptive'
+    DEFAULT_SCALE_SEARCH: str = "linear"
+    ADAPTIVE_COARSE_NUM: int = 4
+    # 0 means no early stop
+    DEFAULT_EARLY_STOP_SIM: float = 0.0
     DEFAULT_MULTI_TARGET_MAX_THRESHOLD: float = 0.99
     DEFAULT_MULTI_TARGET_DISTANCE_THRESHOLD: float = 10.0
     DEFAULT_COMPRESS_RATE: float = 1.0
+    # 0 means no pyramid (search in full resolution directly)
+    DEFAULT_PYRAMID_LEVEL: int = 0
+    DEFAULT_PYRAMID_TOP_K: int = 5
+    # template will not be shrunk smaller than this in pyramid
+    PYRAMID_MIN_TEMPLATE_SIZE: int = 8
+    DEFAULT_FFT: bool = False
+    # 512 MB
+    DEFAULT_FFT_CACHE_BYTES: int = 512 * 1024 * 1024
+    # decoded masks from path
+    MASK_CACHE_SIZE: int = 32
 
     def __init__(
         self,
@@ -29,6 +50,12 @@ class TemplateEngine(FindItEngine):
         engine_template_multi_target_max_threshold: float = None,
         engine_template_multi_target_distance_threshold: float = None,
         engine_template_compress_rate: float = None,
+        engine_template_pyramid_level: int = None,
+        engine_template_pyramid_top_k: int = None,
+        engine_template_fft: bool = None,
+        engine_template_fft_cache_bytes: int = None,
+        engine_template_scale_search: str = None,
+        engine_template_early_stop_sim: float = None,
         *_,
         **__,
     ):
@@ -44,6 +71,21 @@ class TemplateEngine(FindItEngine):
         # scale
         self.engine_template_scale = engine_template_scale or self.DEFAULT_SCALE
 
+        # scale search strategy
+        # linear: every scale in np.linspace(*scale)
+        # adaptive: coarse sweep + golden-section refinement around the best one
+        self.engine_template_scale_search = (
+            engine_template_scale_search or self.DEFAULT_SCALE_SEARCH
+        )
+        assert self.engine_template_scale_search in (
+            "linear",
+            "adaptive",
+        ), f"unknown scale search: {self.engine_template_scale_search}"
+        # stop scale search once max_val is higher than this
+        self.engine_template_early_stop_sim = (
+            engine_template_early_stop_sim or self.DEFAULT_EARLY_STOP_SIM
+        )
+
         # multi target max threshold ( max_val * max_threshold == real threshold )
         self.engine_template_multi_target_max_threshold = (
             engine_template_multi_target_max_threshold
@@ -59,8 +101,30 @@ class TemplateEngine(FindItEngine):
             engine_template_compress_rate or self.DEFAULT_COMPRESS_RATE
         )
 
+        # pyramid (coarse to fine)
+        # level n means searching candidates in a 1/(2^n) picture first
+        self.engine_template_pyramid_level = (
+            engine_template_pyramid_level or self.DEFAULT_PYRAMID_LEVEL
+        )
+        self.engine_template_pyramid_top_k = (
+            engine_template_pyramid_top_k or self.DEFAULT_PYRAMID_TOP_K
+        )
+
+        # batched FFT matching, for TM_CCORR_NORMED only
+        # target will be transformed once, and shared by all the templates and scales
+        self.engine_template_fft = bool(engine_template_fft or self.DEFAULT_FFT)
+        self.engine_template_fft_cache_bytes = (
+            engine_template_fft_cache_bytes or self.DEFAULT_FFT_CACHE_BYTES
+        )
+        # spectrums of templates, key: (template uid, dft size)
+        self._fft_cache = LRUCache(max_bytes=self.engine_template_fft_cache_bytes)
+        # path -> (signature, grey mask)
+        self._mask_cache = LRUCache(max_size=self.MASK_CACHE_SIZE)
+
         logger.debug(f"cv method: {self.engine_template_cv_method_name}")
         logger.debug(f"scale: {self.engine_template_scale}")
+        logger.debug(f"scale search: {self.engine_template_scale_search}")
+        logger.debug(f"early stop sim: {self.engine_template_early_stop_sim}")
         logger.debug(
             f"multi target max threshold: {self.engine_template_multi_target_max_threshold}"
         )
@@ -68,6 +132,9 @@ class TemplateEngine(FindItEngine):
             f"multi target distance threshold: {self.engine_template_multi_target_distance_threshold}"
         )
         logger.debug(f"compress rate: {self.engine_template_compress_rate}")
+        logger.debug(f"pyramid level: {self.engine_template_pyramid_level}")
+        logger.debug(f"pyramid top k: {self.engine_template_pyramid_top_k}")
+        logger.debug(f"fft: {self.engine_template_fft}")
         logger.info(f"engine {self.get_type()} loaded")
 
     def execute(
@@ -76,52 +143,96 @@ class TemplateEngine(FindItEngine):
         target_object: np.ndarray,
         engine_template_mask_pic_object: np.ndarray = None,
         engine_template_mask_pic_path: str = None,
+        executor: concurrent.futures.Executor = None,
+        result_fields: typing.Iterable[str] = None,
+        timer: Timer = None,
+        target_scale: float = None,
+        worker_num: int = None,
         *_,
         **__,
     ) -> FindItEngineResponse:
-        resp = FindItEngineResponse()
-        resp.append("conf", self.__dict__)
+        """
+        :param worker_num: size of executor, scales are evaluated in batches of this size for early stop
+        :param target_scale: target is decoded in this scale (eg: 0.5) of the original picture.
+            only the rest of compression will be done, and points are still in the original one
+        """
+        resp = FindItEngineResponse(result_fields, timer)
+        if resp.want("conf"):
+            resp.append("conf", self.get_conf())
 
         # mask
         if (engine_template_mask_pic_path is not None) or (
             engine_template_mask_pic_object is not None
         ):
             logger.info("mask detected")
-            engine_template_mask_pic_object = toolbox.pre_pic(
+            engine_template_mask_pic_object = self._load_mask(
                 engine_template_mask_pic_path, engine_template_mask_pic_object
             )
 
         # template matching
-        min_val, max_val, min_loc, max_loc, point_list = self._compare_template(
+        (
+            min_val,
+            max_val,
+            min_loc,
+            max_loc,
+            point_list,
+            scale_eval_num,
+        ) = self._compare_template(
             template_object,
             target_object,
             self.engine_template_scale,
             engine_template_mask_pic_object,
+            executor,
+            # multi target points are only in raw
+            need_point_list=resp.want("raw"),
+            timer=resp.timer,
+            target_scale=target_scale,
+            worker_num=worker_num,
         )
 
         # 'target_point' must existed
         resp.append("target_point", max_loc, important=True)
         resp.append("target_sim", max_val, important=True)
-        resp.append(
-            "raw",
-            {
-                "min_val": min_val,
-                "max_val": max_val,
-                "min_loc": min_loc,
-                "max_loc": max_loc,
-                "all": point_list,
-            },
-        )
+        if resp.want("raw"):
+            resp.append(
+                "raw",
+                {
+                    "min_val": min_val,
+                    "max_val": max_val,
+                    "min_loc": min_loc,
+                    "max_loc": max_loc,
+                    "all": point_list,
+                    "scale_eval_num": scale_eval_num,
+                },
+            )
         resp.append("ok", True, important=True)
 
         return resp
 
+    def shift_response(
+        self, resp: FindItEngineResponse, offset_x: float, offset_y: float
+    ):
+        super(TemplateEngine, self).shift_response(resp, offset_x, offset_y)
+        raw = resp.get("raw")
+        if raw is None:
+            return
+        for each_key in ("min_loc", "max_loc"):
+            raw[each_key] = toolbox.shift_point(raw[each_key], offset_x, offset_y)
+        raw["all"] = [
+            toolbox.shift_point(each, offset_x, offset_y) for each in raw["all"]
+        ]
+
     def _compare_template(
         self,
         template_pic_object: np.ndarray,
         target_pic_object: np.ndarray,
         scale: typing.Sequence,
         mask_pic_object: np.ndarray = None,
+        executor: concurrent.futures.Executor = None,
+        need_point_list: bool = True,
+        timer: Timer = NULL_TIMER,
+        target_scale: float = None,
+        worker_num: int = None,
     ) -> typing.Sequence:
         """
         compare via template matching
@@ -131,51 +242,98 @@ class TemplateEngine(FindItEngine):
         :param target_pic_object:
         :param scale: default to (1, 3, 10)
         :param mask_pic_object:
-        :return: min_val, max_val, min_loc, max_loc
+        :param executor: if existed, scales will be matched in it concurrently
+        :param need_point_list: if False, point_list will be empty (and cheaper)
+        :param timer: costs of stages
+        :param target_scale: target has been compressed (eg: decoded in reduced size) to this scale
+        :param worker_num: size of executor
+        :return: min_val, max_val, min_loc, max_loc, point_list, scale_eval_num
         """
-        result_list = list()
-
         # compress
         pic_width, pic_height = target_pic_object.shape[:2]
         logger.debug(
             f"target object size before compressing: w={pic_width}, h={pic_height}"
         )
-        target_pic_object = toolbox.compress_frame(
-            target_pic_object, self.engine_template_compress_rate
-        )
+        # target is shared by all the templates
+        # and only the rest of compression is needed, if it was compressed (decoded in reduced size)
+        origin_target_pic_object = target_pic_object
+        rest_compress_rate = self.engine_template_compress_rate / (target_scale or 1.0)
+        with timer.stage("compress"):
+            if rest_compress_rate != 1.0:
+                target_pic_object = derive(
+                    origin_target_pic_object,
+                    ("compress", rest_compress_rate),
+                    lambda: toolbox.compress_frame(
+                        origin_target_pic_object, rest_compress_rate
+                    ),
+                )
         pic_width, pic_height = target_pic_object.shape[:2]
         logger.debug(
             f"target object size after compressing: w={pic_width}, h={pic_height}"
         )
 
-        for each_scale in np.linspace(*scale):
-            # resize template
-            resize_template_pic_object = toolbox.resize_pic_scale(
-                template_pic_object, each_scale
-            )
-
-            # resize mask
-            if mask_pic_object is not None:
-                mask_pic_object = toolbox.resize_pic_scale(mask_pic_object, each_scale)
+        def _match_scale(each_scale: float) -> typing.Optional[typing.List]:
+            with timer.stage(f"scale[{each_scale:.4g}]"):
+                return _match_scale_without_timer(each_scale)
 
-            # if template's size is larger than raw picture, break
+        def _match_scale_without_timer(
+            each_scale: float,
+        ) -> typing.Optional[typing.List]:
+            # resize template
+            with timer.stage("resize"):
+                resize_template_pic_object = derive(
+                    template_pic_object,
+                    ("scale", each_scale),
+                    lambda: toolbox.resize_pic_scale(template_pic_object, each_scale),
+                )
+
+            # if template's size is larger than raw picture, skip
             if (
                 resize_template_pic_object.shape[0] > pic_width
                 or resize_template_pic_object.shape[1] > pic_height
             ):
-                break
+                return None
+
+            # resize mask (from the origin one, like template)
+            resize_mask_pic_object = None
+            if mask_pic_object is not None:
+                with timer.stage("resize"):
+                    resize_mask_pic_object = self._resize_mask(
+                        mask_pic_object, resize_template_pic_object.shape
+                    )
 
-            res = cv2.matchTemplate(
+            return self._match_template(
                 target_pic_object,
                 resize_template_pic_object,
-                self.engine_template_cv_method_code,
-                mask=mask_pic_object,
+                resize_mask_pic_object,
+                timer,
             )
-            # each of current result is:
-            # [(min_val, max_val, min_loc, max_loc), point_list, shape]
 
-            current_result = [*self._parse_res(res), resize_template_pic_object.shape]
-            result_list.append(current_result)
+        # each of result is:
+        # [(min_val, max_val, min_loc, max_loc), point_list, shape]
+        # or None if template is too large
+        result_dict: typing.Dict[float, typing.Optional[typing.List]] = dict()
+
+        def _evaluate(scale_list: typing.Sequence[float]) -> bool:
+            """ match scales which have not been evaluated, and return True if it is good enough """
+            scale_list = [each for each in scale_list if each not in result_dict]
+            for each_scale, each_result in zip(
+                scale_list, toolbox.parallel_map(_match_scale, scale_list, executor)
+            ):
+                result_dict[each_scale] = each_result
+            return self._good_enough(result_dict.values())
+
+        if self.engine_template_scale_search == "adaptive":
+            self._search_scale_adaptive(scale, _evaluate, result_dict)
+        else:
+            self._search_scale_linear(
+                scale, _evaluate, (worker_num or 1) if executor else 1
+            )
+
+        # results are in order of evaluation, so the best one is always the same
+        result_list = [each for each in result_dict.values() if each is not None]
+        scale_eval_num = len(result_list)
+        logger.debug(f"scale evaluated: {scale_eval_num}")
 
         # too much log here, remove it.
         # logger.debug('scale search result: {}'.format(result_list))
@@ -208,27 +366,353 @@ class TemplateEngine(FindItEngine):
             [min_loc, max_loc],
         )
 
-        point_list = [
-            list(toolbox.fix_location(shape, each))
-            for each in toolbox.point_list_filter(
-                point_list, self.engine_template_multi_target_distance_threshold
-            )
-        ]
-        # sort point list
-        point_list.sort(key=lambda i: i[0])
+        if not need_point_list:
+            point_list = list()
+        else:
+            with timer.stage("point_filter"):
+                point_list = [
+                    toolbox.decompress_point(
+                        toolbox.fix_location(shape, each),
+                        self.engine_template_compress_rate,
+                    )
+                    for each in toolbox.point_list_filter(
+                        point_list,
+                        self.engine_template_multi_target_distance_threshold,
+                    )
+                ]
+        # sort point list (already sorted by x)
 
         logger.debug(f"fixed compare result: {max_loc}, {max_val}")
-        return min_val, max_val, min_loc, max_loc, point_list
+        return min_val, max_val, min_loc, max_loc, point_list, scale_eval_num
+
+    def get_min_target_scale(self) -> float:
+        """ target will be compressed anyway """
+        return self.engine_template_compress_rate
+
+    def get_max_template_scale(self) -> float:
+        """ template is resized up to the largest scale, and matched in the compressed target """
+        return max(self.engine_template_scale[:2]) / self.engine_template_compress_rate
+
+    def _load_mask(
+        self, mask_pic_path: str = None, mask_pic_object: np.ndarray = None
+    ) -> np.ndarray:
+        """ grey mask, decoded once for each path (until its file changed) or object """
+        if mask_pic_object is not None:
+            return derive(
+                mask_pic_object,
+                "grey",
+                lambda: toolbox.load_grey_from_cv2_object(mask_pic_object),
+            )
+
+        stat = os.stat(mask_pic_path)
+        signature = (stat.st_mtime_ns, stat.st_size)
+        cached = self._mask_cache.get(mask_pic_path)
+        if cached and cached[0] == signature:
+            return cached[1]
+        grey_mask = toolbox.load_grey_from_path(mask_pic_path)
+        self._mask_cache.put(mask_pic_path, (signature, grey_mask))
+        return grey_mask
+
+    @staticmethod
+    def _resize_mask(mask_pic_object: np.ndarray, shape: typing.Sequence) -> np.ndarray:
+        """
+        mask for the resized template, cached with mask (like scaled templates).
+        resized to the exact shape of template, and stays binary (nearest).
+        """
+        shape = tuple(shape[:2])
+        if mask_pic_object.shape[:2] == shape:
+            return mask_pic_object
+        return derive(
+            mask_pic_object,
+            ("mask", shape),
+            lambda: cv2.resize(
+                mask_pic_object, shape[::-1], interpolation=cv2.INTER_NEAREST
+            ),
+        )
+
+    def _good_enough(self, result_list: typing.Iterable) -> bool:
+        """ early stop if any result's max_val is higher than engine_template_early_stop_sim """
+        if not self.engine_template_early_stop_sim:
+            return False
+        return any(
+            each[0][1] >= self.engine_template_early_stop_sim
+            for each in result_list
+            if each is not None
+        )
+
+    def _search_scale_linear(
+        self,
+        scale: typing.Sequence,
+        evaluate: typing.Callable[[typing.Sequence[float]], bool],
+        batch_size: int = 1,
+    ):
+        """ evaluate every scale in order, batch_size scales at a time if early stop is enabled """
+        scale_list = [float(each) for each in np.linspace(*scale)]
+        if not self.engine_template_early_stop_sim:
+            evaluate(scale_list)
+            return
+
+        # evaluate step by step (a batch for each worker), and stop as soon as possible
+        for i in range(0, len(scale_list), batch_size):
+            if evaluate(scale_list[i : i + batch_size]):
+                return
+
+    def _search_scale_adaptive(
+        self,
+        scale: typing.Sequence,
+        evaluate: typing.Callable[[typing.Sequence[float]], bool],
+        result_dict: typing.Dict[float, typing.Optional[typing.List]],
+    ):
+        """
+        coarse sweep, and golden-section search around the best scale of it.
+        assume that similarity is unimodal near the best scale.
+        """
+        start, end, *rest = scale
+        num = int(rest[0]) if rest else self.DEFAULT_SCALE_NUM
+        low, high = sorted((float(start), float(end)))
+
+        def _get_sim(each_scale: float) -> float:
+            each_result = result_dict[each_scale]
+            return -np.inf if each_result is None else each_result[0][1]
+
+        # coarse
+        coarse_num = min(num, self.ADAPTIVE_COARSE_NUM)
+        coarse_list = [round(float(each), 3) for each in np.linspace(low, high, coarse_num)]
+        if evaluate(coarse_list) or coarse_num < 2:
+            return
+        best_scale = max(coarse_list, key=_get_sim)
+
+        # refine, until the interval is not larger than the step of linear search
+        coarse_step = (high - low) / (coarse_num - 1)
+        tolerance = (high - low) / max(num - 1, 1)
+        left = max(best_scale - coarse_step, low)
+        right = min(best_scale + coarse_step, high)
+        inv_phi = (np.sqrt(5) - 1) / 2
+        # one of inner points will be reused in next round
+        c = round(right - inv_phi * (right - left), 3)
+        d = round(left + inv_phi * (right - left), 3)
+        while right - left > tolerance and c < d:
+            if evaluate([c, d]):
+                return
+            if _get_sim(c) > _get_sim(d):
+                right, d = d, c
+                c = round(right - inv_phi * (right - left), 3)
+            else:
+                left, c = c, d
+                d = round(left + inv_phi * (right - left), 3)
+
+    def _match_template(
+        self,
+        target_pic_object: np.ndarray,
+        template_pic_object: np.ndarray,
+        mask_pic_object: np.ndarray = None,
+        timer: Timer = NULL_TIMER,
+    ) -> typing.List:
+        """ match template (already resized) with target, return [loc_val, point_list, shape] """
+        if self._pyramid_available(template_pic_object, mask_pic_object):
+            # parsing is a part of it
+            with timer.stage("match"):
+                loc_val, point_list = self._match_template_pyramid(
+                    target_pic_object, template_pic_object
+                )
+        elif self._fft_available(mask_pic_object):
+            with timer.stage("match"):
+                res = self._match_template_fft(target_pic_object, template_pic_object)
+            with timer.stage("parse"):
+                loc_val, point_list = self._parse_res(res)
+        else:
+            with timer.stage("match"):
+                res = cv2.matchTemplate(
+                    target_pic_object,
+                    template_pic_object,
+                    self.engine_template_cv_method_code,
+                    mask=mask_pic_object,
+                )
+            with timer.stage("parse"):
+                loc_val, point_list = self._parse_res(res)
+        return [loc_val, point_list, template_pic_object.shape]
+
+    def _pyramid_available(
+        self, template_pic_object: np.ndarray, mask_pic_object: np.ndarray = None
+    ) -> bool:
+        if not self.engine_template_pyramid_level:
+            return False
+        # masked matching and SQDIFF (lower is better) are not supported
+        if mask_pic_object is not None:
+            return False
+        if self.engine_template_cv_method_code in (cv2.TM_SQDIFF, cv2.TM_SQDIFF_NORMED):
+            return False
+        # template is too small to be shrunk
+        factor = 2 ** self.engine_template_pyramid_level
+        return min(template_pic_object.shape[:2]) // factor >= self.PYRAMID_MIN_TEMPLATE_SIZE
+
+    def _match_template_pyramid(
+        self, target_pic_object: np.ndarray, template_pic_object: np.ndarray
+    ) -> typing.Sequence:
+        """
+        coarse to fine search:
+
+        1. search top k candidates in shrunk target with shrunk template
+        2. refine only small regions around candidates in full resolution
+        """
+        level = self.engine_template_pyramid_level
+        factor = 2 ** level
+        coarse_target = derive(
+            target_pic_object,
+            ("pyramid", level),
+            lambda: toolbox.pyramid_down(target_pic_object, level),
+        )
+        coarse_template = derive(
+            template_pic_object,
+            ("pyramid", level),
+            lambda: toolbox.pyramid_down(template_pic_object, level),
+        )
+        coarse_res = cv2.matchTemplate(
+            coarse_target, coarse_template, self.engine_template_cv_method_code
+        )
+
+        template_height, template_width = template_pic_object.shape[:2]
+        target_height, target_width = target_pic_object.shape[:2]
+        margin = 2 * factor
+
+        # refine each candidate in full resolution
+        region_list = list()
+        for coarse_x, coarse_y in self._get_top_k_loc(
+            coarse_res, self.engine_template_pyramid_top_k, coarse_template.shape
+        ):
+            left = max(coarse_x * factor - margin, 0)
+            top = max(coarse_y * factor - margin, 0)
+            right = min(coarse_x * factor + template_width + margin, target_width)
+            bottom = min(coarse_y * factor + template_height + margin, target_height)
+            # view, no copy
+            region = target_pic_object[top:bottom, left:right]
+            region_res = cv2.matchTemplate(
+                region, template_pic_object, self.engine_template_cv_method_code
+            )
+            region_list.append((region_res, left, top))
+
+        # merge regions
+        min_val, max_val, min_loc, max_loc = None, None, None, None
+        for region_res, left, top in region_list:
+            each_min_val, each_max_val, each_min_loc, each_max_loc = cv2.minMaxLoc(
+                region_res
+            )
+            if min_val is None or each_min_val < min_val:
+                min_val = each_min_val
+                min_loc = (each_min_loc[0] + left, each_min_loc[1] + top)
+            if max_val is None or each_max_val > max_val:
+                max_val = each_max_val
+                max_loc = (each_max_loc[0] + left, each_max_loc[1] + top)
+
+        # multi target
+        min_thresh = (max_val - 1e-6) * self.engine_template_multi_target_max_threshold
+        point_list = np.concatenate(
+            [
+                self._get_point_list(region_res, min_thresh) + (left, top)
+                for region_res, left, top in region_list
+            ]
+        )
+        return (min_val, max_val, min_loc, max_loc), point_list
+
+    def _fft_available(self, mask_pic_object: np.ndarray = None) -> bool:
+        return (
+            self.engine_template_fft
+            and mask_pic_object is None
+            and self.engine_template_cv_method_code == cv2.TM_CCORR_NORMED
+        )
+
+    def _match_template_fft(
+        self, target_pic_object: np.ndarray, template_pic_object: np.ndarray
+    ) -> np.ndarray:
+        """
+        TM_CCORR_NORMED in frequency domain, result is the same as cv2.matchTemplate (within float error)
+
+        circular correlation of picture padded to target size has no wrap-around in its valid part,
+        so all the templates (and scales) share one target spectrum.
+        """
+        target_height, target_width = target_pic_object.shape[:2]
+        template_height, template_width = template_pic_object.shape[:2]
+        dft_size = (
+            cv2.getOptimalDFTSize(target_height),
+            cv2.getOptimalDFTSize(target_width),
+        )
+
+        target_spectrum = derive(
+            target_pic_object,
+            ("spectrum", dft_size),
+            lambda: toolbox.get_spectrum(target_pic_object, dft_size),
+        )
+        template_key = (get_uid(template_pic_object), dft_size)
+        template_spectrum = self._fft_cache.get(template_key)
+        if template_spectrum is None:
+            template_spectrum = toolbox.get_spectrum(template_pic_object, dft_size)
+            self._fft_cache.put(template_key, template_spectrum)
+
+        # sum(target * template)
+        corr = cv2.idft(
+            cv2.mulSpectrums(target_spectrum, template_spectrum, 0, conjB=True),
+            flags=cv2.DFT_REAL_OUTPUT | cv2.DFT_SCALE,
+        )
+        res_height = target_height - template_height + 1
+        res_width = target_width - template_width + 1
+        corr = corr[:res_height, :res_width]
+
+        # sqrt(sum(target ** 2) of each window * sum(template ** 2))
+        # uint8 input will overflow (int32) inside sqrBoxFilter when window is large
+        float_target_pic_object = derive(
+            target_pic_object, "float32", lambda: target_pic_object.astype(np.float32)
+        )
+        window_square_sum = cv2.sqrBoxFilter(
+            float_target_pic_object,
+            cv2.CV_32F,
+            (template_width, template_height),
+            anchor=(0, 0),
+            normalize=False,
+            borderType=cv2.BORDER_CONSTANT,
+        )[:res_height, :res_width]
+        template_norm = float(
+            np.sqrt(np.sum(np.square(template_pic_object, dtype=np.float64)))
+        )
+        denominator = cv2.sqrt(window_square_sum) * template_norm
+
+        # like opencv, empty windows (denominator is 0) get 0
+        res = cv2.divide(corr, denominator)
+        return np.clip(res, -1.0, 1.0, out=res)
+
+    @staticmethod
+    def _get_top_k_loc(
+        res: np.ndarray, k: int, shape: typing.Sequence
+    ) -> typing.List[typing.Tuple[int, int]]:
+        """ locations of top k peaks, neighbours (closer than template size) of found peaks are ignored """
+        res = res.copy()
+        height, width = shape[:2]
+        floor = float(res.min())
+        loc_list = list()
+        for _ in range(k):
+            _, max_val, _, max_loc = cv2.minMaxLoc(res)
+            if loc_list and max_val <= floor:
+                break
+            loc_list.append(max_loc)
+            x, y = max_loc
+            res[
+                max(y - height // 2, 0) : y + height // 2 + 1,
+                max(x - width // 2, 0) : x + width // 2 + 1,
+            ] = floor
+        return loc_list
+
+    @staticmethod
+    def _get_point_list(res: np.ndarray, min_thresh: float) -> np.ndarray:
+        """ local maximums (3x3) which are not lower than min_thresh, array of (x, y) """
+        # flat area will produce a lot of points, keep peaks only
+        peak_mask = (res >= min_thresh) & (res >= cv2.dilate(res, None))
+        match_y, match_x = np.nonzero(peak_mask)
+        return np.stack([match_x, match_y], axis=1).astype(np.float64)
 
     def _parse_res(self, res: np.ndarray) -> typing.Sequence:
         min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(res)
 
         # multi target
         min_thresh = (max_val - 1e-6) * self.engine_template_multi_target_max_threshold
-        match_locations = np.where(res >= min_thresh)
-        point_list = zip(match_locations[1], match_locations[0])
-
-        # convert int32 to float
-        point_list = [tuple(map(float, _)) for _ in point_list]
+        point_list = self._get_point_list(res, min_thresh)
 
         return (min_val, max_val, min_loc, max_loc), point_list
@@ -0,0 +1,65 @@
+""" encode results into bytes, faster and smaller than json (if orjson/msgpack installed) """
+import json
+import typing
+
+import numpy as np
+
+from findit.logger import logger
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+    logger.debug("orjson not found, use json instead")
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+    logger.debug("msgpack should be installed if you want to use msgpack format")
+
+FORMAT_JSON = "json"
+FORMAT_MSGPACK = "msgpack"
+MIME_TYPE_DICT = {
+    FORMAT_JSON: "application/json",
+    FORMAT_MSGPACK: "application/msgpack",
+}
+
+
+def _default(obj: typing.Any) -> typing.Any:
+    """ numpy objects can be found in results """
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f"type {type(obj)} is not serializable")
+
+
+def dumps(obj: typing.Any, fmt: str = None) -> bytes:
+    """
+    :param obj: result of findit, or anything like it
+    :param fmt: 'json' (default) or 'msgpack'
+    :return:
+    """
+    fmt = fmt or FORMAT_JSON
+    if fmt == FORMAT_MSGPACK:
+        assert msgpack, "msgpack should be installed if you want to use msgpack format"
+        return msgpack.packb(obj, default=_default, use_bin_type=True)
+
+    assert fmt == FORMAT_JSON, f"unknown format: {fmt}"
+    if orjson:
+        return orjson.dumps(
+            obj,
+            default=_default,
+            option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS,
+        )
+    return json.dumps(obj, default=_default).encode()
+
+
+def get_format_by_accept(accept: typing.Optional[str]) -> str:
+    """ pick format from http header `Accept`, json by default """
+    if accept and msgpack:
+        for each in ("application/msgpack", "application/x-msgpack"):
+            if each in accept:
+                return FORMAT_MSGPACK
+    return FORMAT_JSON
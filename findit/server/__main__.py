@@ -1,6 +1,14 @@
+# patch blocking calls (eg: threading, socket) before anything uses them.
+# not in worker processes, which import this module as '__mp_main__' (spawn)
+if __name__ == "__main__":
+    from gevent import monkey
+
+    monkey.patch_all()
+
 from findit.server.router import app
 from findit.logger import logger
 from findit.server import config
+from findit.server import utils
 
 import argparse
 import os
@@ -9,27 +17,51 @@ import os
 def start_server():
     logger.info(f"server port: {config.SERVER_PORT}")
     logger.info(f"pic root dir path: {config.PIC_DIR_PATH}")
+    logger.info(f"worker num: {config.WORKER_NUM}")
 
     # check existed
     assert os.path.exists(
         config.PIC_DIR_PATH
     ), f"dir path not existed: {config.PIC_DIR_PATH}"
 
-    from gevent import monkey, pywsgi
+    # matching runs in worker processes,
+    # so greenlets here only parse requests and wait for results
+    import gevent
+    import signal
+    from gevent import pywsgi
 
-    monkey.patch_all()
+    # index pictures, and start all the workers before serving
+    # (each of them decodes all the pictures in its initializer)
+    utils.init_registry(preload=False)
+    utils.start_workers()
     server = pywsgi.WSGIServer(("0.0.0.0", int(config.SERVER_PORT)), app)
-    server.serve_forever()
+    # stop (eg: docker stop) with workers, or they will be left
+    gevent.signal_handler(signal.SIGTERM, server.stop)
+    try:
+        server.serve_forever()
+    finally:
+        utils.stop_workers()
+        logger.info("server stopped")
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("-p", "--port", help="port number")
     parser.add_argument("-d", "--dir", help="pictures root directory")
+    parser.add_argument("-w", "--worker", type=int, help="worker process num")
+    parser.add_argument(
+        "-q", "--queue", type=int, help="max requests in workers, others get 503"
+    )
+    parser.add_argument(
+        "--metrics", action="store_true", help="enable timing and /metrics"
+    )
     args = parser.parse_args()
 
     config.SERVER_PORT = args.port or config.SERVER_PORT
     config.PIC_DIR_PATH = args.dir or config.PIC_DIR_PATH
+    config.WORKER_NUM = args.worker or config.WORKER_NUM
+    config.QUEUE_SIZE = args.queue or config.QUEUE_SIZE
+    config.METRICS_ENABLED = config.METRICS_ENABLED or args.metrics
 
     # should not be empty
     assert config.SERVER_PORT, "no port configured, eg: --port 9410"
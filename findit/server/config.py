@@ -4,10 +4,27 @@ import os
 PIC_EXT_NAME = ".png"
 DEFAULT_TARGET_NAME = "DEFAULT_TARGET_NAME"
 ALLOWED_EXTRA_ARGS = set("mask_pic_path")
+# max count of reusable findit instances (one for each init config)
+FINDIT_POOL_SIZE = 16
+# seconds between two scans of PIC_DIR_PATH, for picking up changed templates
+TEMPLATE_SCAN_INTERVAL = 2.0
 
 # arg parse
 PORT_ENV_NAME = "FINDIT_SERVER_PORT"
 PIC_ROOT_ENV_NAME = "FINDIT_SERVER_PIC_ROOT_PATH"
+WORKER_NUM_ENV_NAME = "FINDIT_SERVER_WORKER_NUM"
+QUEUE_SIZE_ENV_NAME = "FINDIT_SERVER_QUEUE_SIZE"
+METRICS_ENV_NAME = "FINDIT_SERVER_METRICS"
 
 SERVER_PORT: int = int(os.environ.get(PORT_ENV_NAME, default=9410))
 PIC_DIR_PATH: str = os.environ.get(PIC_ROOT_ENV_NAME, default="")
+# worker processes for matching, default to cpu count
+WORKER_NUM: int = int(os.environ.get(WORKER_NUM_ENV_NAME, default=0)) or (
+    os.cpu_count() or 1
+)
+# max count of requests in workers (running + waiting), default to WORKER_NUM * 4
+# others will get 503 immediately
+QUEUE_SIZE: int = int(os.environ.get(QUEUE_SIZE_ENV_NAME, default=0))
+# record timing of requests and stages, for /metrics. set it to '1' for enabling.
+# timing costs a little, and it is returned only to clients which ask for it (extras: timing)
+METRICS_ENABLED: bool = os.environ.get(METRICS_ENV_NAME, default="0") == "1"
@@ -0,0 +1,162 @@
+""" prometheus metrics (text format), without any dependencies """
+import threading
+import typing
+
+# seconds
+DEFAULT_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n")
+
+
+def _format_labels(label_name_list: typing.Sequence[str], label_value_list) -> str:
+    if not label_name_list:
+        return ""
+    pair_list = [
+        f'{name}="{_escape(value)}"'
+        for name, value in zip(label_name_list, label_value_list)
+    ]
+    return "{" + ",".join(pair_list) + "}"
+
+
+class _Metric(object):
+    TYPE: str = ""
+
+    def __init__(self, name: str, doc: str, label_name_list: typing.Sequence[str] = ()):
+        self.name = name
+        self.doc = doc
+        self.label_name_list = tuple(label_name_list)
+        self._lock = threading.Lock()
+
+    def get_sample_name(self) -> str:
+        return self.name
+
+    def render(self) -> typing.List[str]:
+        name = self.get_sample_name()
+        return [f"# HELP {name} {self.doc}", f"# TYPE {name} {self.TYPE}"]
+
+
+class Counter(_Metric):
+    TYPE = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super(Counter, self).__init__(*args, **kwargs)
+        self._value_dict: typing.Dict[tuple, float] = dict()
+
+    def inc(self, label_value_list: typing.Sequence = (), value: float = 1.0):
+        key = tuple(label_value_list)
+        with self._lock:
+            self._value_dict[key] = self._value_dict.get(key, 0.0) + value
+
+    def get_sample_name(self) -> str:
+        return f"{self.name}_total"
+
+    def render(self) -> typing.List[str]:
+        line_list = super(Counter, self).render()
+        with self._lock:
+            item_list = sorted(self._value_dict.items())
+        for key, value in item_list:
+            labels = _format_labels(self.label_name_list, key)
+            line_list.append(f"{self.get_sample_name()}{labels} {value}")
+        return line_list
+
+
+class Histogram(_Metric):
+    TYPE = "histogram"
+
+    def __init__(self, *args, buckets: typing.Sequence[float] = None, **kwargs):
+        super(Histogram, self).__init__(*args, **kwargs)
+        self.buckets = tuple(buckets or DEFAULT_BUCKETS)
+        # labels -> [count of each bucket (not cumulative) + inf, sum]
+        self._value_dict: typing.Dict[tuple, list] = dict()
+
+    def observe(self, label_value_list: typing.Sequence, value: float):
+        key = tuple(label_value_list)
+        index = len(self.buckets)
+        for i, each in enumerate(self.buckets):
+            if value <= each:
+                index = i
+                break
+        with self._lock:
+            item = self._value_dict.get(key)
+            if item is None:
+                item = [[0] * (len(self.buckets) + 1), 0.0]
+                self._value_dict[key] = item
+            item[0][index] += 1
+            item[1] += value
+
+    def render(self) -> typing.List[str]:
+        line_list = super(Histogram, self).render()
+        with self._lock:
+            item_list = sorted(
+                (key, (list(count_list), total))
+                for key, (count_list, total) in self._value_dict.items()
+            )
+        label_name_list = self.label_name_list + ("le",)
+        for key, (count_list, total) in item_list:
+            cumulative = 0
+            for bucket, count in zip(self.buckets + ("+Inf",), count_list):
+                cumulative += count
+                labels = _format_labels(label_name_list, key + (bucket,))
+                line_list.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.label_name_list, key)
+            line_list.append(f"{self.name}_sum{labels} {total}")
+            line_list.append(f"{self.name}_count{labels} {cumulative}")
+        return line_list
+
+
+REQUEST_COUNTER = Counter(
+    "findit_requests", "analyse requests, by status", ("status",)
+)
+REQUEST_HISTOGRAM = Histogram(
+    "findit_request_seconds", "cost of analyse requests (including queue wait)"
+)
+QUEUE_WAIT_HISTOGRAM = Histogram(
+    "findit_queue_wait_seconds", "waiting time of requests, before workers start them"
+)
+STAGE_HISTOGRAM = Histogram(
+    "findit_stage_seconds",
+    "cost of stages in finding, by engine, stage and template",
+    ("engine", "stage", "template"),
+)
+METRIC_LIST = [
+    REQUEST_COUNTER,
+    REQUEST_HISTOGRAM,
+    QUEUE_WAIT_HISTOGRAM,
+    STAGE_HISTOGRAM,
+]
+
+
+def observe_timing(timing: dict):
+    """ timing from findit's result """
+    for name, cost in timing.items():
+        if name != "engine":
+            STAGE_HISTOGRAM.observe(("", name, ""), cost)
+    for template_name, engine_timing_dict in (timing.get("engine") or dict()).items():
+        for engine_name, stage_dict in engine_timing_dict.items():
+            for stage_name, cost in stage_dict.items():
+                # eg: 'scale[1.2]', one series for all the scales
+                stage_name = stage_name.split("[")[0]
+                STAGE_HISTOGRAM.observe((engine_name, stage_name, template_name), cost)
+
+
+def render() -> str:
+    line_list = list()
+    for each in METRIC_LIST:
+        line_list += each.render()
+    return "\n".join(line_list) + "\n"
@@ -0,0 +1,160 @@
+""" in-memory index of pictures in PIC_DIR_PATH """
+import os
+import time
+import threading
+import typing
+
+import numpy as np
+
+from findit import toolbox
+from findit.logger import logger
+import findit.server.config as config
+
+
+class _TemplateItem(object):
+    def __init__(self, name: str, path: str, signature: tuple):
+        self.name = name
+        self.path = path
+        # (mtime_ns, size), for detecting changes
+        self.signature = signature
+        # decoded grey picture, None if not preloaded
+        self.pic_object: typing.Optional[np.ndarray] = None
+
+    def get_info(self) -> dict:
+        info = {
+            "name": self.name,
+            "path": self.path,
+            "mtime_ns": self.signature[0],
+            "size": self.signature[1],
+        }
+        if self.pic_object is not None:
+            info["shape"] = self.pic_object.shape
+        return info
+
+
+class TemplateRegistry(object):
+    """
+    pictures in root dir, indexed (and decoded, if preload) in memory.
+
+    call `scan` (or `start_watching`) to pick up added/changed/removed files.
+    name of picture is its path relative to root dir, eg: 'a.png' or 'sub/b.png'.
+    """
+
+    def __init__(self, root: str, preload: bool = True):
+        """
+        :param root: pictures root dir
+        :param preload: decode pictures when indexing, or only index their paths
+        """
+        self.root = root
+        self.preload = preload
+        self._item_dict: typing.Dict[str, _TemplateItem] = dict()
+        self._lock = threading.Lock()
+        self._watcher: typing.Optional[threading.Thread] = None
+
+    @staticmethod
+    def normalize_name(pic_name: str) -> str:
+        # auto fix ext name
+        if "." not in os.path.basename(pic_name):
+            pic_name += config.PIC_EXT_NAME
+        return pic_name.replace(os.sep, "/")
+
+    def _walk(self) -> typing.Dict[str, typing.Tuple[str, tuple]]:
+        """ name -> (path, signature) """
+        result = dict()
+        for dir_path, _, file_name_list in os.walk(self.root):
+            for each_file_name in file_name_list:
+                each_path = os.path.join(dir_path, each_file_name)
+                try:
+                    stat = os.stat(each_path)
+                except OSError:
+                    # removed during walking
+                    continue
+                each_name = os.path.relpath(each_path, self.root)
+                result[self.normalize_name(each_name)] = (
+                    each_path,
+                    (stat.st_mtime_ns, stat.st_size),
+                )
+        return result
+
+    def _build_item(
+        self, name: str, path: str, signature: tuple
+    ) -> typing.Optional[_TemplateItem]:
+        item = _TemplateItem(name, path, signature)
+        if self.preload:
+            try:
+                with open(path, "rb") as f:
+                    item.pic_object = toolbox.load_grey_from_bytes(f.read())
+            except (OSError, AssertionError):
+                # not a picture, or removed
+                logger.warning(f"failed to load picture: {path}")
+                return None
+        return item
+
+    def scan(self) -> typing.Tuple[list, list, list]:
+        """ sync with root dir, and return names of (added, changed, removed) """
+        file_dict = self._walk()
+        with self._lock:
+            old_item_dict = dict(self._item_dict)
+
+        added, changed = list(), list()
+        new_item_dict = dict()
+        for each_name, (each_path, each_signature) in file_dict.items():
+            old_item = old_item_dict.get(each_name)
+            if old_item and old_item.signature == each_signature:
+                new_item_dict[each_name] = old_item
+                continue
+            # decode outside the lock, requests can still use old ones
+            new_item = self._build_item(each_name, each_path, each_signature)
+            if not new_item:
+                continue
+            new_item_dict[each_name] = new_item
+            (changed if old_item else added).append(each_name)
+        removed = [each for each in old_item_dict if each not in new_item_dict]
+
+        with self._lock:
+            self._item_dict = new_item_dict
+        if added or changed or removed:
+            logger.info(
+                f"templates updated, added: {added}, changed: {changed}, removed: {removed}"
+            )
+        return added, changed, removed
+
+    def get(self, pic_name: str) -> typing.Optional[_TemplateItem]:
+        pic_name = self.normalize_name(pic_name)
+        with self._lock:
+            item = self._item_dict.get(pic_name)
+        if item:
+            return item
+
+        # maybe added after last scan
+        path = os.path.join(self.root, pic_name)
+        if not os.path.isfile(path):
+            return None
+        stat = os.stat(path)
+        item = self._build_item(pic_name, path, (stat.st_mtime_ns, stat.st_size))
+        if item:
+            with self._lock:
+                item = self._item_dict.setdefault(pic_name, item)
+        return item
+
+    def get_info(self) -> typing.List[dict]:
+        with self._lock:
+            item_list = list(self._item_dict.values())
+        return [each.get_info() for each in sorted(item_list, key=lambda x: x.name)]
+
+    def start_watching(self, interval: float = None):
+        """ scan root dir every `interval` seconds, in a daemon thread """
+        if self._watcher:
+            return
+        interval = interval or config.TEMPLATE_SCAN_INTERVAL
+
+        def _watch():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.scan()
+                except Exception as e:
+                    logger.error(f"failed to scan templates: {e}")
+
+        self._watcher = threading.Thread(target=_watch, daemon=True)
+        self._watcher.start()
@@ -1,12 +1,12 @@
 """ standalone server """
-import os
-import tempfile
 import json
+import time
 from collections import namedtuple
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request
 
-from findit import FindIt
+from findit import serialize
 import findit.server.config as config
+import findit.server.metrics as metrics
 import findit.server.utils as utils
 
 # standard response
@@ -14,11 +14,19 @@ _FindItResponse = namedtuple("FindItResponse", ("status", "msg", "request", "res
 STATUS_OK = "OK"
 STATUS_CLIENT_ERROR = "CLIENT_ERROR"
 STATUS_SERVER_ERROR = "SERVER_ERROR"
+STATUS_SERVER_BUSY = "SERVER_BUSY"
 
 
 def std_response(**kwargs):
+    if "request" in kwargs:
+        kwargs["request"] = kwargs["request"].to_dict()
     _response = _FindItResponse(**kwargs)
-    return jsonify(_response._asdict())
+    # json (by default) or msgpack, decided by header `Accept`
+    fmt = serialize.get_format_by_accept(request.headers.get("Accept"))
+    return Response(
+        serialize.dumps(_response._asdict(), fmt),
+        mimetype=serialize.MIME_TYPE_DICT[fmt],
+    )
 
 
 # init server
@@ -35,56 +43,114 @@ def hello():
     )
 
 
+@app.route("/templates")
+def templates():
+    return std_response(
+        status=STATUS_OK,
+        msg="",
+        request=request.form,
+        response={"templates": utils.get_registry().get_info()},
+    )
+
+
+@app.route("/metrics")
+def get_metrics():
+    if not config.METRICS_ENABLED:
+        return Response("metrics disabled\n", status=404, mimetype="text/plain")
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+
 @app.route("/analyse", methods=["POST"])
 def analyse():
+    if not config.METRICS_ENABLED:
+        return _analyse()[1]
+
+    start = time.time()
+    status = STATUS_SERVER_ERROR
+    try:
+        status, resp = _analyse()
+        return resp
+    finally:
+        metrics.REQUEST_COUNTER.inc((status,))
+        metrics.REQUEST_HISTOGRAM.observe((), time.time() - start)
+
+
+def _analyse() -> tuple:
+    """ returns (status, response) """
     # required
     # support multi pictures, split with ','
     template_name = request.form.get("template_name")
     template_name_list = template_name.split(",") if template_name else list()
-    template_dict = dict()
 
     # optional
     extra_str = request.form.get("extras")
     extra_dict = json.loads(extra_str) if extra_str else dict()
     new_extra_dict = utils.handle_extras(extra_dict)
-
+    # only these keys will be built and returned, split with ','
+    # eg: 'target_point,target_sim'
+    fields = request.form.get("fields")
+    if fields:
+        new_extra_dict["result_fields"] = fields.split(",")
+    # costs of stages, for metrics. returned only if client asks for it
+    timing_wanted = bool(new_extra_dict.get("timing"))
+    if config.METRICS_ENABLED:
+        new_extra_dict.setdefault("timing", True)
+
+    registry = utils.get_registry()
     for each_template_name in template_name_list:
-        template_path = utils.get_pic_path_by_name(each_template_name)
-
         # file not existed
-        if not template_path:
-            return std_response(
-                status=STATUS_CLIENT_ERROR,
-                msg=f"no template named: {each_template_name}",
-                request=request.form,
-                response=dict(),
+        if not registry.get(each_template_name):
+            return (
+                STATUS_CLIENT_ERROR,
+                std_response(
+                    status=STATUS_CLIENT_ERROR,
+                    msg=f"no template named: {each_template_name}",
+                    request=request.form,
+                    response=dict(),
+                ),
             )
-        template_dict[each_template_name] = template_path
-
-    # save target pic
-    target_pic_file = request.files["file"]
-    temp_pic_file_object = tempfile.NamedTemporaryFile(
-        mode="wb+", suffix=".png", delete=False
-    )
-    temp_pic_file_object.write(target_pic_file.read())
-    temp_pic_file_object.close()
-
-    # init findit
-    fi = FindIt(need_log=True, **new_extra_dict)
 
-    # load all templates
-    for each_template_name, each_template_path in template_dict.items():
-        fi.load_template(each_template_name, pic_path=each_template_path)
-
-    _response = fi.find(
-        config.DEFAULT_TARGET_NAME,
-        target_pic_path=temp_pic_file_object.name,
-        **new_extra_dict,
-    )
-
-    # clean
-    os.remove(temp_pic_file_object.name)
-
-    return std_response(
-        status=STATUS_OK, msg="", request=request.form, response=_response
+    # too many requests in workers, fail fast
+    executor, executor_slot = utils.get_executor()
+    if not executor_slot.acquire(blocking=False):
+        return (
+            STATUS_SERVER_BUSY,
+            (
+                std_response(
+                    status=STATUS_SERVER_BUSY,
+                    msg="server is busy, try again later",
+                    request=request.form,
+                    response=dict(),
+                ),
+                503,
+                {"Retry-After": "1"},
+            ),
+        )
+
+    try:
+        target_pic_file = request.files["file"]
+        future = executor.submit(
+            utils.analyse,
+            template_name_list,
+            target_pic_file.read(),
+            new_extra_dict,
+            time.time(),
+        )
+        _response = future.result()
+    finally:
+        executor_slot.release()
+
+    if config.METRICS_ENABLED:
+        metrics.QUEUE_WAIT_HISTOGRAM.observe((), _response["queue_wait"])
+        if "timing" in _response:
+            metrics.observe_timing(_response["timing"])
+    if not timing_wanted:
+        _response.pop("timing", None)
+        _response.pop("load_path", None)
+
+    return (
+        STATUS_OK,
+        std_response(
+            status=STATUS_OK, msg="", request=request.form, response=_response
+        ),
     )
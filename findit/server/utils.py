@@ -1,18 +1,56 @@
 import os
+import sys
+import json
+import time
+import threading
+import typing
+import multiprocessing
+import concurrent.futures
 
+from findit import FindIt
+from findit.cache import LRUCache
+from findit.server.registry import TemplateRegistry
 import findit.server.config as config
 
+# findit instance (with its engines) is expensive, reuse it
+# key: init config, value: (findit, its lock)
+_findit_pool = LRUCache(max_size=config.FINDIT_POOL_SIZE)
+_findit_pool_lock = threading.Lock()
+
+# matching is CPU bound, run it in worker processes
+_executor: typing.Optional[concurrent.futures.ProcessPoolExecutor] = None
+_executor_slot: typing.Optional[threading.BoundedSemaphore] = None
+_executor_lock = threading.Lock()
+
+# pictures in PIC_DIR_PATH.
+# main process only indexes them, and workers keep them decoded.
+_registry: typing.Optional[TemplateRegistry] = None
+_registry_lock = threading.Lock()
+
 
 # utils
-def get_pic_path_by_name(pic_name: str) -> str:
-    # auto fix ext name
-    if "." not in pic_name:
-        pic_name += config.PIC_EXT_NAME
+def init_registry(pic_dir_path: str = None, preload: bool = True) -> TemplateRegistry:
+    """ index (and decode) all the pictures, and keep watching for changes """
+    global _registry
+    if pic_dir_path:
+        config.PIC_DIR_PATH = pic_dir_path
+    with _registry_lock:
+        if _registry is None:
+            _registry = TemplateRegistry(config.PIC_DIR_PATH, preload=preload)
+            _registry.scan()
+            _registry.start_watching()
+    return _registry
+
+
+def get_registry() -> TemplateRegistry:
+    return _registry or init_registry(preload=False)
 
-    result = os.path.join(config.PIC_DIR_PATH, pic_name)
-    if not os.path.isfile(result):
+
+def get_pic_path_by_name(pic_name: str) -> str:
+    item = get_registry().get(pic_name)
+    if not item:
         return ""
-    return result
+    return item.path
 
 
 def handle_extras(extra_dict: dict) -> dict:
@@ -30,3 +68,100 @@ def handle_extras(extra_dict: dict) -> dict:
 
     # and so on ...
     return extra_dict
+
+
+def get_findit(init_dict: dict) -> typing.Tuple[FindIt, threading.Lock]:
+    """
+    get a reusable findit instance, built with init_dict.
+    templates of findit are shared, so hold the lock before using it.
+    """
+    key = json.dumps(init_dict, sort_keys=True, default=str)
+    with _findit_pool_lock:
+        pool_item = _findit_pool.get(key)
+        if pool_item is None:
+            pool_item = (FindIt(need_log=True, **init_dict), threading.Lock())
+            _findit_pool.put(key, pool_item)
+    return pool_item
+
+
+def get_executor() -> typing.Tuple[
+    concurrent.futures.ProcessPoolExecutor, threading.BoundedSemaphore
+]:
+    """
+    worker pool, and its slots (acquire one before submitting, release it when done).
+    no slot means the server is saturated.
+    """
+    global _executor, _executor_slot
+    with _executor_lock:
+        if _executor is None:
+            queue_size = config.QUEUE_SIZE or config.WORKER_NUM * 4
+            # spawn: forking a process with running threads is not safe
+            _executor = concurrent.futures.ProcessPoolExecutor(
+                max_workers=config.WORKER_NUM,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=init_registry,
+                initargs=(config.PIC_DIR_PATH, True),
+            )
+            _executor_slot = threading.BoundedSemaphore(queue_size)
+    return _executor, _executor_slot
+
+
+def _get_worker_pid() -> int:
+    # hold this worker for a while, so that others get the rest of tasks
+    time.sleep(0.1)
+    return os.getpid()
+
+
+def start_workers() -> concurrent.futures.ProcessPoolExecutor:
+    """
+    start all the workers now, and wait until they are ready (pictures decoded in initializer).
+    workers are started on demand by default, and the first requests would wait for them.
+    """
+    executor, _ = get_executor()
+    pid_set = set()
+    while len(pid_set) < config.WORKER_NUM:
+        future_list = [
+            executor.submit(_get_worker_pid) for _ in range(config.WORKER_NUM)
+        ]
+        pid_set.update(each.result() for each in future_list)
+    return executor
+
+
+def stop_workers():
+    """ stop workers, requests waiting in the queue are dropped (or finished before python 3.9) """
+    executor, _ = get_executor()
+    # cancel_futures is new in python 3.9
+    if sys.version_info >= (3, 9):
+        executor.shutdown(cancel_futures=True)
+    else:
+        executor.shutdown()
+
+
+def analyse(
+    template_name_list: typing.List[str],
+    target_pic_bytes: bytes,
+    extra_dict: dict,
+    submit_time: float,
+) -> dict:
+    """ run in worker process """
+    queue_wait = time.time() - submit_time
+
+    # reuse findit (and its engines)
+    fi, fi_lock = get_findit(extra_dict)
+    with fi_lock:
+        # load all templates, from memory
+        fi.clear()
+        registry = get_registry()
+        for each_template_name in template_name_list:
+            each_item = registry.get(each_template_name)
+            assert each_item, f"no template named: {each_template_name}"
+            fi.load_template(each_template_name, pic_object=each_item.pic_object)
+
+        response = fi.find(
+            config.DEFAULT_TARGET_NAME,
+            # decoded (straight to grey, in memory) by findit, as 'decode' in timing
+            target_pic_object=target_pic_bytes,
+            **extra_dict,
+        )
+    response["queue_wait"] = queue_wait
+    return response
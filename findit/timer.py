@@ -0,0 +1,59 @@
+import contextlib
+import threading
+import time
+import typing
+
+
+class Timer(object):
+    """
+    cost (seconds) of stages, eg: 'compress' or 'match'.
+    a stage can be entered many times (eg: once for each scale, in different threads), costs are summed.
+    """
+
+    def __init__(self):
+        self._cost_dict: typing.Dict[str, float] = dict()
+        self._lock = threading.Lock()
+
+    def __bool__(self):
+        return True
+
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def add(self, name: str, cost: float):
+        with self._lock:
+            self._cost_dict[name] = self._cost_dict.get(name, 0.0) + cost
+
+    def get_dict(self) -> typing.Dict[str, float]:
+        with self._lock:
+            return dict(self._cost_dict)
+
+
+class _NullTimer(Timer):
+    """ does nothing, for disabled timing """
+
+    def __init__(self):
+        super(_NullTimer, self).__init__()
+        self._null_context = contextlib.nullcontext()
+
+    def __bool__(self):
+        return False
+
+    def stage(self, name: str):
+        return self._null_context
+
+    def add(self, name: str, cost: float):
+        pass
+
+
+# shared, stateless
+NULL_TIMER = _NullTimer()
+
+
+def get_timer(enabled: bool) -> Timer:
+    return Timer() if enabled else NULL_TIMER
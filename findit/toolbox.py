@@ -7,42 +7,126 @@ import datetime
 import tempfile
 import contextlib
 import os
+import concurrent.futures
+import hashlib
 from collections import namedtuple
-from scipy.spatial.distance import euclidean
 
 Point = namedtuple("Point", ("x", "y"))
 
 
+# how pictures are turned into grey, reported by load_grey
+# already grey uint8, no copy
+LOAD_PATH_GREY: str = "grey"
+# converted from colorful picture
+LOAD_PATH_BGR: str = "bgr"
+LOAD_PATH_BGRA: str = "bgra"
+# decoded (and converted) from file or memory
+LOAD_PATH_IMREAD: str = "imread"
+LOAD_PATH_IMDECODE: str = "imdecode"
+# prefix, if dtype is not uint8
+LOAD_PATH_ASTYPE: str = "astype+"
+
+# decoders can shrink pictures while decoding, much cheaper than decoding and resizing (eg: jpeg)
+# reduce factor -> flag
+# colorful, not grey: grey decoding of some decoders is different from cvtColor (eg: gamma of png)
+REDUCED_COLOR_FLAG_DICT: typing.Dict[int, int] = {
+    1: cv2.IMREAD_COLOR,
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+}
+
+PicItem = typing.Union[str, bytes, bytearray, memoryview, np.ndarray]
+
+
+def load_grey(pic_item: PicItem, reduce: int = None) -> typing.Tuple[np.ndarray, str]:
+    """
+    turn picture into grey (uint8), copy only if needed
+
+    :param pic_item: path, encoded bytes (eg: png, bytes/bytearray/memoryview), or cv object
+    :param reduce: 1, 2, 4 or 8. encoded pictures will be decoded in about 1/reduce size, cv objects are not affected
+    :return: grey picture, and how it was loaded (LOAD_PATH_*), eg: 'grey' means no copy at all, 'imread/2' means reduced
+
+    the same picture is always turned into the same grey one, whether it is a path, bytes or cv object:
+    encoded pictures are decoded into BGR and converted, like cv objects.
+    grey cv objects are not copied, a new view of it is returned instead.
+    so things derived from it (see cache.derive) live with this view only, and changes of the object are never missed.
+    """
+    reduce = reduce or 1
+    assert reduce in REDUCED_COLOR_FLAG_DICT, f"reduce should be 1, 2, 4 or 8, not {reduce}"
+    suffix = f"/{reduce}" if reduce > 1 else ""
+
+    if isinstance(pic_item, str):
+        assert os.path.isfile(pic_item), f"picture [{pic_item}] not existed"
+        pic_object = cv2.imread(pic_item, REDUCED_COLOR_FLAG_DICT[reduce])
+        assert pic_object is not None, f"failed to decode picture [{pic_item}]"
+        return cv2.cvtColor(pic_object, cv2.COLOR_BGR2GRAY), LOAD_PATH_IMREAD + suffix
+
+    if isinstance(pic_item, (bytes, bytearray, memoryview)):
+        # frombuffer is a view, no copy
+        pic_object = cv2.imdecode(
+            np.frombuffer(pic_item, np.uint8), REDUCED_COLOR_FLAG_DICT[reduce]
+        )
+        assert pic_object is not None, "failed to decode picture from bytes"
+        return cv2.cvtColor(pic_object, cv2.COLOR_BGR2GRAY), LOAD_PATH_IMDECODE + suffix
+
+    prefix = ""
+    if pic_item.dtype != np.uint8:
+        pic_item = pic_item.astype(np.uint8)
+        prefix = LOAD_PATH_ASTYPE
+
+    if pic_item.ndim == 2:
+        # a new view (no copy), see above
+        return pic_item.view(), prefix + LOAD_PATH_GREY
+    channel_num = pic_item.shape[2]
+    if channel_num == 1:
+        # (h, w, 1) -> (h, w), still a view
+        return pic_item.reshape(pic_item.shape[:2]), prefix + LOAD_PATH_GREY
+    if channel_num == 4:
+        return cv2.cvtColor(pic_item, cv2.COLOR_BGRA2GRAY), prefix + LOAD_PATH_BGRA
+    return cv2.cvtColor(pic_item, cv2.COLOR_BGR2GRAY), prefix + LOAD_PATH_BGR
+
+
 def load_grey_from_path(pic_path: str) -> np.ndarray:
     """ load grey picture (with cv2) from path """
-    assert os.path.isfile(pic_path), f"picture [{pic_path}] not existed"
-    raw_img = cv2.imread(pic_path)
-    return load_grey_from_cv2_object(raw_img)
+    return load_grey(pic_path)[0]
 
 
 def load_grey_from_cv2_object(pic_object: np.ndarray) -> np.ndarray:
-    """ preparation for cv2 object (force turn it into gray) """
-    pic_object = pic_object.astype(np.uint8)
-    try:
-        # try to turn it into grey
-        grey_pic = cv2.cvtColor(pic_object, cv2.COLOR_BGR2GRAY)
-    except cv2.error:
-        # already grey
-        return pic_object
-    return grey_pic
+    """ preparation for cv2 object (force turn it into gray), returns a view of it if it is grey already """
+    return load_grey(pic_object)[0]
+
+
+def load_grey_from_bytes(pic_bytes: typing.Union[bytes, memoryview]) -> np.ndarray:
+    """ decode picture (encoded, eg: png) from memory, without any temp files """
+    return load_grey(pic_bytes)[0]
 
 
-def pre_pic(pic_path: str = None, pic_object: np.ndarray = None) -> np.ndarray:
-    """ this method will turn pic path and pic object into grey pic object """
+def pre_pic(pic_path: str = None, pic_object: PicItem = None) -> np.ndarray:
+    """ this method will turn pic path and pic object (or encoded bytes) into grey pic object """
     if pic_object is not None:
-        return load_grey_from_cv2_object(pic_object)
-    return load_grey_from_path(pic_path)
+        return load_grey(pic_object)[0]
+    return load_grey(pic_path)[0]
 
 
 def resize_pic_scale(pic_object: np.ndarray, target_scale: np.ndarray) -> np.ndarray:
     return imutils.resize(pic_object, width=int(pic_object.shape[1] * target_scale))
 
 
+def pyramid_down(pic_object: np.ndarray, level: int) -> np.ndarray:
+    """ shrink picture to 1/(2^level) with gaussian pyramid """
+    for _ in range(level):
+        pic_object = cv2.pyrDown(pic_object)
+    return pic_object
+
+
+def get_spectrum(pic_object: np.ndarray, dft_size: typing.Sequence) -> np.ndarray:
+    """ DFT (CCS packed) of picture, padded with zero to dft_size (height, width) """
+    padded = np.zeros(dft_size, dtype=np.float32)
+    padded[: pic_object.shape[0], : pic_object.shape[1]] = pic_object
+    return cv2.dft(padded)
+
+
 def turn_grey(old: np.ndarray) -> np.ndarray:
     try:
         return cv2.cvtColor(old, cv2.COLOR_RGB2GRAY)
@@ -50,8 +134,40 @@ def turn_grey(old: np.ndarray) -> np.ndarray:
         return old
 
 
+def get_content_hash(pic_object: np.ndarray) -> str:
+    """ same pixels (and shape), same hash """
+    pic_object = np.ascontiguousarray(pic_object)
+    content_hash = hashlib.sha1(pic_object.data)
+    content_hash.update(f"{pic_object.shape}{pic_object.dtype}".encode())
+    return content_hash.hexdigest()
+
+
+def get_dhash(pic_object: np.ndarray) -> int:
+    """
+    perceptual hash (difference hash, 64 bits) of grey picture.
+    similar pictures (eg: same screen with a blinking cursor) have similar hashes, see get_hash_distance
+    """
+    thumbnail = cv2.resize(pic_object, (9, 8), interpolation=cv2.INTER_AREA)
+    bit_array = thumbnail[:, 1:] > thumbnail[:, :-1]
+    return int.from_bytes(np.packbits(bit_array).tobytes(), "big")
+
+
+def get_hash_distance(hash_a: int, hash_b: int) -> int:
+    """ hamming distance between perceptual hashes """
+    return bin(hash_a ^ hash_b).count("1")
+
+
+def get_reduce(target_scale: float) -> int:
+    """ the largest reduce factor (for decoding, see load_grey) which keeps target_scale of the picture """
+    for each in sorted(REDUCED_COLOR_FLAG_DICT, reverse=True):
+        if 1 / each >= target_scale:
+            return each
+    return 1
+
+
 def decompress_point(old: typing.Tuple, compress_rate: float) -> typing.List:
-    return [int(i / compress_rate) for i in old]
+    # float error should not move points, eg: 7 / 0.07 == 99.99999999999999
+    return [int(i / compress_rate + 1e-9) for i in old]
 
 
 def compress_frame(
@@ -96,6 +212,60 @@ def compress_frame(
     )
 
 
+def get_region(
+    shape: typing.Sequence, region: typing.Sequence
+) -> typing.Tuple[int, int, int, int]:
+    """
+    absolute region (left, top, right, bottom) in picture of this shape
+
+    :param shape: shape of picture
+    :param region: (left, top, right, bottom), absolute or fractional
+        (all in [0, 1] and any of them is float, eg: (0, 0.5, 1, 1))
+    :return:
+    """
+    height, width = shape[:2]
+    if len(region) != 4:
+        raise ValueError(f"region should be (left, top, right, bottom): {region}")
+    left, top, right, bottom = region
+    if all(0 <= each <= 1 for each in region) and any(
+        isinstance(each, (float, np.floating)) for each in region
+    ):
+        left, right = left * width, right * width
+        top, bottom = top * height, bottom * height
+    left, right = [int(min(max(each, 0), width)) for each in (left, right)]
+    top, bottom = [int(min(max(each, 0), height)) for each in (top, bottom)]
+    if (left >= right) or (top >= bottom):
+        raise ValueError(
+            f"empty region: {region} -> {(left, top, right, bottom)} in picture of w={width}, h={height}"
+        )
+    return left, top, right, bottom
+
+
+def crop_view(pic_object: np.ndarray, region: typing.Sequence) -> np.ndarray:
+    """ region (left, top, right, bottom) of picture, a view (no copy) """
+    left, top, right, bottom = region
+    return pic_object[top:bottom, left:right]
+
+
+def shift_point(
+    point: typing.Sequence, offset_x: float, offset_y: float
+) -> typing.List:
+    x, y = point
+    return [x + offset_x, y + offset_y]
+
+
+def get_thumbnail(pic_object: np.ndarray, width: int = None) -> np.ndarray:
+    """ small version of picture, for comparing pictures quickly """
+    width = width or 64
+    height = max(int(pic_object.shape[0] * width / pic_object.shape[1]), 1)
+    return cv2.resize(pic_object, (width, height), interpolation=cv2.INTER_AREA)
+
+
+def get_mean_diff(pic_object: np.ndarray, another_pic_object: np.ndarray) -> float:
+    """ mean of absolute difference (0-255) """
+    return float(np.mean(cv2.absdiff(pic_object, another_pic_object)))
+
+
 def fix_location(shape: typing.Sequence, location: typing.Sequence) -> typing.Sequence:
     """ location from cv2 should be left-top location, and need to fix it and make it central """
     size_y, size_x = shape
@@ -134,24 +304,48 @@ def cv2file(pic_object: np.ndarray) -> str:
 
 
 def point_list_filter(
-    point_list: typing.Sequence, distance: float, point_limit: int = None
-) -> typing.Sequence:
-    """ remove some points which are too close """
+    point_list: typing.Union[typing.Sequence, np.ndarray],
+    distance: float,
+    point_limit: int = None,
+) -> typing.List[typing.Tuple[float, float]]:
+    """
+    remove some points which are too close
+
+    points are checked in order of (x, y), and a point will be kept if it is not too close to kept ones.
+    """
     if not point_limit:
         point_limit = 20
 
-    point_list = sorted(list(set(point_list)), key=lambda o: o[0])
-    new_point_list = [point_list[0]]
-    for cur_point in point_list[1:]:
-        for each_confirmed_point in new_point_list:
-            cur_distance = euclidean(cur_point, each_confirmed_point)
-            # existed
-            if cur_distance < distance:
-                break
-        else:
-            new_point_list.append(cur_point)
-            if len(new_point_list) >= point_limit:
-                break
+    point_array = np.asarray(point_list, dtype=np.float64).reshape(-1, 2)
+    if not len(point_array):
+        return list()
+
+    # sort by (x, y), and remove duplicated points
+    point_array = point_array[np.lexsort((point_array[:, 1], point_array[:, 0]))]
+    duplicated = np.all(point_array[1:] == point_array[:-1], axis=1)
+    point_array = point_array[np.insert(~duplicated, 0, True)]
+    x_array, y_array = point_array[:, 0], point_array[:, 1]
+
+    # every round, the first alive point will be kept, and its neighbours are removed.
+    # all the points before it have been handled, so only a window (x + distance) needs checking.
+    alive = np.ones(len(point_array), dtype=bool)
+    new_point_list = list()
+    cur_index = 0
+    while len(new_point_list) < point_limit:
+        alive_offset = int(np.argmax(alive[cur_index:]))
+        if not alive[cur_index + alive_offset]:
+            break
+        cur_index += alive_offset
+        cur_x, cur_y = x_array[cur_index], y_array[cur_index]
+        new_point_list.append((float(cur_x), float(cur_y)))
+
+        window_end = int(np.searchsorted(x_array, cur_x + distance, side="left"))
+        window = slice(cur_index, window_end)
+        too_close = (x_array[window] - cur_x) ** 2 + (
+            y_array[window] - cur_y
+        ) ** 2 < distance ** 2
+        alive[window][too_close] = False
+        alive[cur_index] = False
     return new_point_list
 
 
@@ -160,3 +354,27 @@ def debug_cv_object(target_object: np.ndarray, prefix: str) -> str:
     mark_pic_path = f"{prefix}_{get_timestamp()}.png"
     cv2.imwrite(mark_pic_path, target_object)
     return mark_pic_path
+
+
+def parallel_map(
+    func: typing.Callable,
+    item_list: typing.Sequence,
+    executor: concurrent.futures.Executor = None,
+) -> typing.List:
+    """
+    map func to item list, in executor if existed. results keep the order of item list.
+
+    tasks which have not been started when we are waiting for them will run in current thread.
+    so it is safe to call parallel_map inside tasks of the same executor (no deadlock).
+    """
+    if (not executor) or len(item_list) < 2:
+        return [func(each) for each in item_list]
+
+    future_list = [executor.submit(func, each) for each in item_list]
+    result_list = list()
+    for each_item, each_future in zip(item_list, future_list):
+        if each_future.cancel():
+            result_list.append(func(each_item))
+        else:
+            result_list.append(each_future.result())
+    return result_list
@@ -6,12 +6,16 @@ install_requirement_list = [
     "imutils",
     "numpy",
     "loguru",
-    "scikit-learn",
-    "scikit-image",
-    "scipy",
+    # engines from entry points
+    'importlib_metadata; python_version < "3.8"',
 ]
 
-extras_require_dict = {"web": ["flask", "gevent"]}
+extras_require_dict = {
+    "web": ["flask", "gevent"],
+    "sklearn": ["scikit-learn"],
+    # faster serialization
+    "fast": ["orjson", "msgpack"],
+}
 
 setup(
     name="findit",
@@ -20,8 +24,8 @@ setup(
     author="williamfzc",
     author_email="fengzc@vip.qq.com",
     url="https://github.com/williamfzc/findit",
-    packages=find_packages(),
-    python_requires=">=3.6",
+    packages=find_packages(exclude=("tests", "benchmark", "benchmark.*")),
+    python_requires=">=3.7",
     install_requires=install_requirement_list,
     extras_require=extras_require_dict,
 )
@@ -0,0 +1,660 @@
+import os
+import json
+import shutil
+import time
+
+import cv2
+import pytest
+import numpy as np
+
+from findit import FindIt, toolbox
+from findit.engine.template import TemplateEngine
+from findit.engine.feature import FeatureEngine
+
+# globals
+TARGET_PATH = r"sample/pics/screen.png"
+TEMPLATE_PATH = r"sample/pics/wechat_logo.png"
+APP_STORE_TEMPLATE_PATH = r"sample/pics/app_store_logo.png"
+
+
+def test_template_cache(tmp_path):
+    template_path = str(tmp_path / "template.png")
+    shutil.copy(TEMPLATE_PATH, template_path)
+
+    fi = FindIt(engine=["template"])
+    fi.load_template("wechat_logo", pic_path=template_path)
+    first = fi.find("screen", target_pic_path=TARGET_PATH)
+    second = fi.find("screen", target_pic_path=TARGET_PATH)
+    assert first == second
+
+    # decoded only once
+    stat = fi.template.get_cache_stat()
+    assert stat["miss"] == 1
+    assert stat["hit"] == 1
+
+    # file changed, and should be reloaded
+    template = cv2.imread(template_path)
+    cv2.imwrite(template_path, template[: template.shape[0] // 2])
+    os.utime(template_path, ns=(0, 0))
+    _, template_object = next(fi.template.load())
+    assert template_object.shape[0] == template.shape[0] // 2
+
+
+def test_template_cache_budget():
+    fi = FindIt(engine=["template"], template_cache_bytes=1)
+    fi.load_template("wechat_logo", pic_path=TEMPLATE_PATH)
+    fi.find("screen", target_pic_path=TARGET_PATH)
+    fi.find("screen", target_pic_path=TARGET_PATH)
+
+    # too large to be cached
+    stat = fi.template.get_cache_stat()
+    assert stat["size"] == 0
+    assert stat["miss"] == 2
+
+    # no caching at all
+    fi = FindIt(engine=["template"], template_cache_bytes=0)
+    fi.load_template("wechat_logo", pic_path=TEMPLATE_PATH)
+    fi.find("screen", target_pic_path=TARGET_PATH)
+    stat = fi.template.get_cache_stat()
+    assert stat["size"] == 0
+    assert stat["nbytes"] == 0
+
+
+def test_template_cache_object():
+    # objects with the same shape and dtype are different templates
+    template = cv2.imread(TEMPLATE_PATH)
+    fi = FindIt(engine=["template"])
+    for i in range(3):
+        fi.load_template(f"template_{i}", pic_object=np.roll(template, i * 10, axis=1))
+    for each_name, each_object in fi.template.load():
+        i = int(each_name.split("_")[-1])
+        expected = cv2.cvtColor(np.roll(template, i * 10, axis=1), cv2.COLOR_BGR2GRAY)
+        assert np.array_equal(each_object, expected)
+    assert fi.template.get_cache_stat()["size"] == 3
+
+    # released objects, whose ids may be reused
+    for _ in range(3):
+        fi.clear()
+        fi.load_template("template", pic_object=np.roll(template, 10, axis=1))
+        _, template_object = next(fi.template.load())
+        expected = cv2.cvtColor(np.roll(template, 10, axis=1), cv2.COLOR_BGR2GRAY)
+        assert np.array_equal(template_object, expected)
+
+
+def test_template_pyramid():
+    result_list = list()
+    for pyramid_level in (0, 2):
+        fi = FindIt(
+            engine=["template"],
+            engine_template_scale=(1, 1, 1),
+            engine_template_pyramid_level=pyramid_level,
+        )
+        fi.load_template("app_store_logo", pic_path=APP_STORE_TEMPLATE_PATH)
+        result = fi.find("screen", target_pic_path=TARGET_PATH)
+        result_list.append(result["data"]["app_store_logo"]["TemplateEngine"])
+
+    full, pyramid = result_list
+    assert full["target_point"] == pyramid["target_point"]
+    assert abs(full["target_sim"] - pyramid["target_sim"]) < 1e-4
+
+
+def test_worker_num():
+    result_list = list()
+    for worker_num in (None, 4):
+        fi = FindIt(
+            engine=["template"], engine_template_scale=(1, 2, 5), worker_num=worker_num
+        )
+        fi.load_template("wechat_logo", pic_path=TEMPLATE_PATH)
+        fi.load_template("app_store_logo", pic_path=APP_STORE_TEMPLATE_PATH)
+        result_list.append(fi.find("screen", target_pic_path=TARGET_PATH))
+
+    serial, parallel = result_list
+    assert serial == parallel
+    assert list(parallel["data"]) == ["wechat_logo", "app_store_logo"]
+
+
+def test_template_fft():
+    target = cv2.imread(TARGET_PATH, cv2.IMREAD_GRAYSCALE)
+    template = cv2.imread(TEMPLATE_PATH, cv2.IMREAD_GRAYSCALE)
+    engine = TemplateEngine(engine_template_fft=True)
+    res = engine._match_template_fft(target, template)
+    expected = cv2.matchTemplate(target, template, cv2.TM_CCORR_NORMED)
+    assert res.shape == expected.shape
+    assert np.abs(res - expected).max() < 1e-4
+
+    result_list = list()
+    for fft in (False, True):
+        fi = FindIt(engine=["template"], engine_template_fft=fft)
+        fi.load_template("wechat_logo", pic_path=TEMPLATE_PATH)
+        fi.load_template("app_store_logo", pic_path=APP_STORE_TEMPLATE_PATH)
+        result = fi.find("screen", target_pic_path=TARGET_PATH)
+        result_list.append(
+            [each["TemplateEngine"]["target_point"] for each in result["data"].values()]
+        )
+    assert result_list[0] == result_list[1]
+
+
+def test_point_list_filter():
+    point_list = [(10.0, 0.0), (0.0, 0.0), (3.0, 4.0), (0.0, 0.0), (20.0, 1.0)]
+    assert toolbox.point_list_filter(point_list, 5) == [
+        (0.0, 0.0),
+        (3.0, 4.0),
+        (10.0, 0.0),
+        (20.0, 1.0),
+    ]
+    assert toolbox.point_list_filter(point_list, 6) == [
+        (0.0, 0.0),
+        (10.0, 0.0),
+        (20.0, 1.0),
+    ]
+    assert toolbox.point_list_filter(point_list, 6, point_limit=2) == [
+        (0.0, 0.0),
+        (10.0, 0.0),
+    ]
+    assert toolbox.point_list_filter(list(), 6) == list()
+
+    # flat result map should not produce a lot of points
+    res = np.ones((500, 500), dtype=np.float32)
+    assert len(toolbox.point_list_filter(np.argwhere(res), 10)) == 20
+
+
+def test_scale_search():
+    scale = (1, 3, 50)
+    fi = FindIt(engine=["template"], pro_mode=True, engine_template_scale=scale)
+    fi.load_template("wechat_logo", pic_path=TEMPLATE_PATH)
+    linear = fi.find("screen", target_pic_path=TARGET_PATH)
+    linear = linear["data"]["wechat_logo"]["TemplateEngine"]
+    assert linear["raw"]["scale_eval_num"] == 50
+
+    fi = FindIt(
+        engine=["template"],
+        pro_mode=True,
+        engine_template_scale=scale,
+        engine_template_scale_search="adaptive",
+    )
+    fi.load_template("wechat_logo", pic_path=TEMPLATE_PATH)
+    adaptive = fi.find("screen", target_pic_path=TARGET_PATH)
+    adaptive = adaptive["data"]["wechat_logo"]["TemplateEngine"]
+    assert adaptive["raw"]["scale_eval_num"] < 20
+    assert adaptive["target_point"] == linear["target_point"]
+    assert adaptive["target_sim"] >= linear["target_sim"] - 1e-3
+
+    # early stop
+    fi = FindIt(
+        engine=["template"],
+        pro_mode=True,
+        engine_template_scale=scale,
+        engine_template_early_stop_sim=0.9,
+    )
+    fi.load_template("wechat_logo", pic_path=TEMPLATE_PATH)
+    early_stop = fi.find("screen", target_pic_path=TARGET_PATH)
+    early_stop = early_stop["data"]["wechat_logo"]["TemplateEngine"]
+    assert early_stop["raw"]["scale_eval_num"] == 1
+
+    # a batch for each worker
+    fi = FindIt(
+        engine=["template"],
+        pro_mode=True,
+        worker_num=2,
+        engine_template_scale=scale,
+        engine_template_early_stop_sim=0.9,
+    )
+    fi.load_template("wechat_logo", pic_path=TEMPLATE_PATH)
+    # args of __init__ may be in kwargs too (eg: extras of server)
+    early_stop = fi.find("screen", target_pic_path=TARGET_PATH, worker_num=8)
+    early_stop = early_stop["data"]["wechat_logo"]["TemplateEngine"]
+    assert early_stop["raw"]["scale_eval_num"] == 2
+
+
+def test_feature_cache():
+    engine = FeatureEngine()
+    target = cv2.imread(TARGET_PATH, cv2.IMREAD_GRAYSCALE)
+    template = cv2.imread(APP_STORE_TEMPLATE_PATH, cv2.IMREAD_GRAYSCALE)
+
+    # computed once for each picture
+    assert engine.get_feature(target) is engine.get_feature(target)
+    first = engine.get_feature_point_list(template, target)
+    second = engine.get_feature_point_list(template, target)
+    assert first == second
+
+
+def test_feature_cluster_method():
+    pytest.importorskip("sklearn")
+
+    rng = np.random.default_rng(1)
+    point_array = np.vstack(
+        [rng.normal(each, 5, (20, 2)) for each in ((0, 0), (100, 100), (300, 50))]
+        + [rng.normal((100, 100), 5, (20, 2))]
+    )
+    center_list = [
+        FeatureEngine(engine_feature_cluster_method=each).calculate_center_point(
+            point_array
+        )
+        for each in ("numpy", "sklearn")
+    ]
+    assert np.allclose(*center_list)
+
+
+def test_engine_registry():
+    import findit.engine
+
+    class _DummyEngine(findit.engine.FindItEngine):
+        def execute(self, *_, **__):
+            resp = findit.engine.FindItEngineResponse()
+            resp.append("ok", True, important=True)
+            return resp
+
+    findit.engine.register_engine("dummy", _DummyEngine)
+    fi = FindIt(engine=["dummy"])
+    fi.load_template("wechat_logo", pic_path=TEMPLATE_PATH)
+    result = fi.find("screen", target_pic_path=TARGET_PATH)
+    assert result["data"]["wechat_logo"]["_DummyEngine"]["ok"]
+
+    assert "template" in findit.engine.engine_dict
+    assert findit.engine.engine_dict["template"] is findit.engine.TemplateEngine
+
+
+def test_engine_entry_point(tmp_path, monkeypatch):
+    import findit.engine
+
+    # a fake installed package, with an engine in entry points
+    (tmp_path / "fake_findit_engine.py").write_text(
+        "from findit.engine import FindItEngine\n"
+        "class FakeEngine(FindItEngine):\n"
+        "    pass\n"
+    )
+    dist_info = tmp_path / "fake_findit_engine-0.1.dist-info"
+    dist_info.mkdir()
+    (dist_info / "METADATA").write_text(
+        "Metadata-Version: 2.1\nName: fake-findit-engine\nVersion: 0.1\n"
+    )
+    (dist_info / "entry_points.txt").write_text(
+        f"[{findit.engine.ENTRY_POINT_GROUP}]\n"
+        "fake = fake_findit_engine:FakeEngine\n"
+        # built-in ones can not be replaced
+        "template = fake_findit_engine:FakeEngine\n"
+    )
+    monkeypatch.syspath_prepend(str(tmp_path))
+
+    registry = findit.engine._EngineRegistry(findit.engine._BUILTIN_ENGINE_PATH_DICT)
+    assert "fake" in registry
+    assert registry["fake"].__name__ == "FakeEngine"
+    assert registry["template"] is findit.engine.TemplateEngine
+
+    # python 3.8 and 3.9 return a dict
+    assert findit.engine._select_entry_points({"a": [1]}, "a") == [1]
+    assert findit.engine._select_entry_points({}, "a") == []
+
+
+def test_template_region():
+    fi = FindIt(engine=["template"], pro_mode=True)
+    fi.load_template("wechat_logo", pic_path=TEMPLATE_PATH)
+    full = fi.find("screen", target_pic_path=TARGET_PATH)
+    full = full["data"]["wechat_logo"]["TemplateEngine"]
+
+    for region in ((300, 250, 700, 500), (0.3, 0.5, 0.7, 0.9)):
+        fi.clear()
+        fi.load_template("wechat_logo", pic_path=TEMPLATE_PATH, region=region)
+        result = fi.find("screen", target_pic_path=TARGET_PATH)
+        result = result["data"]["wechat_logo"]["TemplateEngine"]
+        assert result["target_point"] == full["target_point"]
+        assert result["raw"]["all"] == full["raw"]["all"]
+
+    # overwrite region in find
+    result = fi.find(
+        "screen",
+        target_pic_path=TARGET_PATH,
+        template_region_dict={"wechat_logo": (0, 0, 300, 300)},
+    )
+    result = result["data"]["wechat_logo"]["TemplateEngine"]
+    assert result["target_point"] != full["target_point"]
+    x, y = result["target_point"]
+    assert (0 <= x <= 300) and (0 <= y <= 300)
+
+    # fractional if any of them is float, and ints only are pixels
+    assert toolbox.get_region((500, 1000), (0, 0.5, 1, 1)) == (0, 250, 1000, 500)
+    assert toolbox.get_region((500, 1000), (0, 0, 1, 1)) == (0, 0, 1, 1)
+    for region in ((0.5, 0, 0.5, 1), (1200, 0, 1300, 100), (0, 0, 1)):
+        with pytest.raises(ValueError):
+            toolbox.get_region((500, 1000), region)
+
+
+def test_load_grey():
+    colorful = cv2.imread(TARGET_PATH)
+    # the same, however it is loaded
+    expected = cv2.cvtColor(colorful, cv2.COLOR_BGR2GRAY)
+    with open(TARGET_PATH, "rb") as f:
+        pic_bytes = f.read()
+
+    grey, load_path = toolbox.load_grey(TARGET_PATH)
+    assert load_path == toolbox.LOAD_PATH_IMREAD
+    assert np.array_equal(grey, expected)
+    for each in (pic_bytes, memoryview(pic_bytes)):
+        grey, load_path = toolbox.load_grey(each)
+        assert load_path == toolbox.LOAD_PATH_IMDECODE
+        assert np.array_equal(grey, expected)
+
+    grey, load_path = toolbox.load_grey(colorful)
+    assert load_path == toolbox.LOAD_PATH_BGR
+    assert np.array_equal(grey, expected)
+
+    # no copy
+    grey, load_path = toolbox.load_grey(expected)
+    assert load_path == toolbox.LOAD_PATH_GREY
+    assert np.shares_memory(grey, expected) and grey is not expected
+    grey, load_path = toolbox.load_grey(expected[:, :, np.newaxis])
+    assert np.shares_memory(grey, expected) and grey.shape == expected.shape
+
+    grey, load_path = toolbox.load_grey(expected.astype(np.float32))
+    assert load_path == toolbox.LOAD_PATH_ASTYPE + toolbox.LOAD_PATH_GREY
+    assert np.array_equal(grey, expected)
+
+    fi = FindIt(engine=["template"], timing=True)
+    fi.load_template("wechat_logo", pic_path=TEMPLATE_PATH)
+    result = fi.find("screen", target_pic_object=pic_bytes)
+    assert result["load_path"] == toolbox.LOAD_PATH_IMDECODE
+    assert (
+        result["data"]
+        == fi.find("screen", target_pic_object=expected)["data"]
+        == fi.find("screen", target_pic_path=TARGET_PATH)["data"]
+    )
+
+
+def test_reused_buffer():
+    fi = FindIt(engine=["template", "feature"])
+    fi.load_template("wechat_logo", pic_path=TEMPLATE_PATH)
+    target = cv2.cvtColor(cv2.imread(TARGET_PATH), cv2.COLOR_BGR2GRAY)
+    buffer = target.copy()
+    fi.find("screen", target_pic_object=buffer)
+
+    # next frame, written into the same buffer
+    buffer[:] = np.roll(target, 100, axis=0)
+    result = fi.find("screen", target_pic_object=buffer)
+    expected = fi.find("screen", target_pic_object=buffer.copy())
+    assert result["data"] == expected["data"]
+    point = result["data"]["wechat_logo"]["TemplateEngine"]["target_point"]
+    assert abs(point[1] - 474) <= 2
+
+
+def test_reduced_decode():
+    assert [toolbox.get_reduce(each) for each in (1.0, 0.6, 0.5, 0.3, 0.1)] == [
+        1,
+        1,
+        2,
+        2,
+        8,
+    ]
+    target = cv2.cvtColor(cv2.imread(TARGET_PATH), cv2.COLOR_BGR2GRAY)
+    grey, load_path = toolbox.load_grey(TARGET_PATH, 2)
+    assert load_path == toolbox.LOAD_PATH_IMREAD + "/2"
+    assert all(abs(a * 2 - b) <= 1 for a, b in zip(grey.shape, target.shape))
+
+    fi = FindIt(engine=["template"], timing=True, engine_template_compress_rate=0.5)
+    fi.load_template("wechat_logo", pic_path=TEMPLATE_PATH, region=(0, 200, 1027, 531))
+    fi.load_template("app_store_logo", pic_path=APP_STORE_TEMPLATE_PATH)
+    result = fi.find("screen", target_pic_path=TARGET_PATH)
+    assert result["load_path"] == toolbox.LOAD_PATH_IMREAD + "/2"
+    # compressed from the full one
+    expected = fi.find("screen", target_pic_object=target)
+    assert expected["load_path"] == toolbox.LOAD_PATH_GREY
+    for name, each in result["data"].items():
+        expected_each = expected["data"][name]["TemplateEngine"]
+        assert abs(each["TemplateEngine"]["target_sim"] - expected_each["target_sim"]) < 0.01
+    # app store logo has near-tied candidates in half size, only compare the other one
+    point = result["data"]["wechat_logo"]["TemplateEngine"]["target_point"]
+    expected_point = expected["data"]["wechat_logo"]["TemplateEngine"]["target_point"]
+    assert all(abs(a - b) <= 2 for a, b in zip(point, expected_point))
+
+    # feature engine needs the whole target
+    fi = FindIt(engine=["template", "feature"], engine_template_compress_rate=0.5)
+    assert fi._get_decode_reduce() == 1
+
+
+def test_result_cache(tmp_path):
+    from findit.cache import LRUCache
+
+    target = cv2.imread(TARGET_PATH, cv2.IMREAD_GRAYSCALE)
+    option = dict(
+        engine=["template"], result_cache_size=4, result_cache_dir=str(tmp_path)
+    )
+    fi = FindIt(result_cache_near_distance=2, **option)
+    fi.load_template("wechat_logo", pic_path=TEMPLATE_PATH)
+
+    expected = fi.find("screen", target_pic_object=target)
+    assert expected["result_cache"] == "miss"
+    result = fi.find("screen", target_pic_object=target.copy())
+    assert result["result_cache"] == "exact"
+    assert result["data"] == expected["data"]
+
+    # almost the same screen
+    near_target = target.copy()
+    near_target[:2, :2] = 0
+    assert fi.find("screen", target_pic_object=near_target)["result_cache"] == "near"
+
+    # different context
+    result = fi.find("screen", target_pic_object=target, result_fields=["ok"])
+    assert result["result_cache"] == "miss"
+    fi.load_template("app_store_logo", pic_path=APP_STORE_TEMPLATE_PATH)
+    result = fi.find("screen", target_pic_object=target)
+    assert result["result_cache"] == "miss"
+    assert set(result["data"]) == {"wechat_logo", "app_store_logo"}
+    assert fi.result_cache.get_stat()["hit"] == 2
+    assert fi.result_cache.get_stat()["miss"] == 3
+
+    # from disk, exact only
+    fi = FindIt(**option)
+    fi.load_template("wechat_logo", pic_path=TEMPLATE_PATH)
+    result = fi.find("screen", target_pic_object=target)
+    assert result["result_cache"] == "disk"
+    assert result["data"] == json.loads(json.dumps(expected["data"]))
+    assert fi.find("screen", target_pic_object=near_target)["result_cache"] == "miss"
+
+    cache = LRUCache(ttl=0.05)
+    cache.put("a", 1)
+    assert cache.get("a") == 1
+    time.sleep(0.1)
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_template_mask(tmp_path):
+    template = cv2.imread(TEMPLATE_PATH, cv2.IMREAD_GRAYSCALE)
+    mask = np.full_like(template, 255)
+    mask[: mask.shape[0] // 3] = 0
+    mask_path = str(tmp_path / "mask.png")
+    cv2.imwrite(mask_path, mask)
+
+    option = dict(engine=["template"], pro_mode=True, engine_template_scale=(1, 2, 3))
+    fi = FindIt(**option)
+    fi.load_template("wechat_logo", pic_path=TEMPLATE_PATH)
+    expected = fi.find(
+        "screen", target_pic_path=TARGET_PATH, engine_template_mask_pic_path=mask_path
+    )["data"]["wechat_logo"]["TemplateEngine"]
+
+    # attached at load time
+    fi = FindIt(**option)
+    fi.load_template("wechat_logo", pic_path=TEMPLATE_PATH, mask_pic_path=mask_path)
+    for _ in range(2):
+        result = fi.find("screen", target_pic_path=TARGET_PATH)
+        result = result["data"]["wechat_logo"]["TemplateEngine"]
+        assert result["target_point"] == expected["target_point"]
+        assert result["target_sim"] == expected["target_sim"]
+
+    # decoded and resized once
+    grey_mask = fi.template.get_mask("wechat_logo")
+    assert grey_mask is fi.template.get_mask("wechat_logo")
+    resized = TemplateEngine._resize_mask(grey_mask, (20, 30))
+    assert resized.shape == (20, 30)
+    assert set(np.unique(resized)) <= {0, 255}
+    assert resized is TemplateEngine._resize_mask(grey_mask, (20, 30))
+
+
+def test_track():
+    screen = cv2.imread(TARGET_PATH)
+    # same frame twice, then move. and jump out of windows at last
+    shift_list = [0, 0, 5, 5, 10, 10, 300]
+
+    def _frame_iter():
+        for each in shift_list:
+            yield np.roll(screen, each, axis=1)
+
+    # multi scale, templates are found in larger sizes
+    fi = FindIt(engine=["template"])
+    fi.load_template("wechat_logo", pic_path=TEMPLATE_PATH)
+    fi.load_template("app_store_logo", pic_path=APP_STORE_TEMPLATE_PATH)
+
+    result_list = list(fi.track(_frame_iter()))
+    assert [each["frame_id"] for each in result_list] == list(range(len(shift_list)))
+    assert [each["skipped"] for each in result_list] == [False, True] * 3 + [False]
+    for each_frame, each_result in zip(_frame_iter(), result_list):
+        expected = fi.find("frame", target_pic_object=each_frame)
+        for each_name, each_expected in expected["data"].items():
+            each_expected = each_expected["TemplateEngine"]
+            each_actual = each_result["data"][each_name]["TemplateEngine"]
+            assert each_actual["target_point"] == each_expected["target_point"]
+            assert abs(each_actual["target_sim"] - each_expected["target_sim"]) < 1e-4
+    assert result_list[-1]["data"]["wechat_logo"]["TemplateEngine"]["target_point"][0] > 800
+
+    # frame size changed, and last positions are out of it
+    small_frame = screen[:200, :200]
+    result_list = list(fi.track([screen, small_frame]))
+    expected = fi.find("frame", target_pic_object=small_frame)
+    assert result_list[-1]["data"] == expected["data"]
+
+    # tracking works without sim in results
+    result_list = list(fi.track(_frame_iter(), result_fields=["target_point"]))
+    for each_frame, each_result in zip(_frame_iter(), result_list):
+        expected = fi.find(
+            "frame", target_pic_object=each_frame, result_fields=["target_point"]
+        )
+        assert each_result["data"] == expected["data"]
+
+
+def test_find_many():
+    fi = FindIt(engine=["template"])
+    fi.load_template("wechat_logo", pic_path=TEMPLATE_PATH)
+    expected = fi.find("screen", target_pic_path=TARGET_PATH)
+
+    target_list = [TARGET_PATH] * 4 + [cv2.imread(TARGET_PATH)] * 2
+    result_list = list(fi.find_many(target_list, process_num=2, max_in_flight=3))
+    assert [each["target_id"] for each in result_list] == list(range(6))
+    for each in result_list:
+        assert each["data"] == expected["data"]
+
+    result_list = list(fi.find_many(target_list, process_num=2, ordered=False))
+    assert sorted(each["target_id"] for each in result_list) == list(range(6))
+
+
+def test_thread_safety():
+    import concurrent.futures
+
+    fi = FindIt(engine=["template", "feature"], pro_mode=True, worker_num=2)
+    fi.load_template("wechat_logo", pic_path=TEMPLATE_PATH)
+    fi.load_template("app_store_logo", pic_path=APP_STORE_TEMPLATE_PATH)
+    conf_list = [each.get_conf() for each in fi.engine_list]
+
+    target = cv2.imread(TARGET_PATH)
+    option_list = [
+        dict(),
+        dict(result_fields=["target_point"]),
+        dict(template_region_dict={"wechat_logo": (0.0, 0.5, 1.0, 1.0)}),
+    ]
+
+    def _find(option: dict) -> dict:
+        result = fi.find("screen", target_pic_object=target.copy(), **option)
+        # costs are different every time
+        result.pop("timing")
+        for each in result["data"].values():
+            for each_engine_result in each.values():
+                each_engine_result.pop("timing", None)
+        return result
+
+    expected_list = [_find(each) for each in option_list]
+    with concurrent.futures.ThreadPoolExecutor(8) as executor:
+        result_list = list(executor.map(_find, option_list * 8))
+    for i, each in enumerate(result_list):
+        assert each == expected_list[i % len(option_list)]
+    assert [each.get_conf() for each in fi.engine_list] == conf_list
+
+
+def test_result_fields():
+    from findit import serialize
+
+    fi = FindIt(engine=["template", "feature"], pro_mode=True)
+    fi.load_template("wechat_logo", pic_path=TEMPLATE_PATH)
+    full = fi.find("screen", target_pic_path=TARGET_PATH)
+
+    fields = ["target_point", "target_sim"]
+    fi = FindIt(engine=["template", "feature"], pro_mode=True, result_fields=fields)
+    fi.load_template("wechat_logo", pic_path=TEMPLATE_PATH, region=(0.0, 0.0, 1.0, 1.0))
+    result = fi.find("screen", target_pic_path=TARGET_PATH)
+    for each_engine, each_result in result["data"]["wechat_logo"].items():
+        each_full = full["data"]["wechat_logo"][each_engine]
+        assert each_result == {k: each_full[k] for k in fields if k in each_full}
+
+    assert json.loads(serialize.dumps(result)) == json.loads(json.dumps(result))
+
+
+def test_timing():
+    fi = FindIt(engine=["template"])
+    fi.load_template("wechat_logo", pic_path=TEMPLATE_PATH)
+    result = fi.find("screen", target_pic_path=TARGET_PATH)
+    assert "timing" not in result
+    assert "timing" not in result["data"]["wechat_logo"]["TemplateEngine"]
+
+    fi = FindIt(engine=["template"], pro_mode=True, engine_template_scale=(1, 2, 2))
+    fi.load_template("wechat_logo", pic_path=TEMPLATE_PATH)
+    result = fi.find("screen", target_pic_path=TARGET_PATH)
+    engine_timing = result["timing"]["engine"]["wechat_logo"]["TemplateEngine"]
+    assert {"decode", "total"} <= set(result["timing"])
+    assert {"compress", "match", "parse", "scale[1]", "scale[2]"} <= set(engine_timing)
+    assert result["data"]["wechat_logo"]["TemplateEngine"]["timing"] == engine_timing
+
+
+def test_sim():
+    skimage_metrics = pytest.importorskip("skimage.metrics")
+    from findit.engine.sim import SimEngine
+
+    engine = SimEngine()
+    target = cv2.imread(TARGET_PATH, cv2.IMREAD_GRAYSCALE)
+    template_list = [
+        cv2.imread(each, cv2.IMREAD_GRAYSCALE)
+        for each in (TEMPLATE_PATH, APP_STORE_TEMPLATE_PATH)
+    ] + [target[:300, :200].copy()]
+
+    ssim_list = engine.calculate_ssim(template_list, target)
+    for each_template, each_ssim in zip(template_list, ssim_list):
+        resized = cv2.resize(
+            target, each_template.shape[::-1], interpolation=cv2.INTER_CUBIC
+        )
+        expected = skimage_metrics.structural_similarity(resized, each_template)
+        assert abs(each_ssim - expected) < 1e-6
+    assert engine.execute(template_list[0], target)["ssim"] == ssim_list[0]
+
+
+def test_ocr_tile():
+    from findit.engine.ocr import get_tile_list, merge_tile_result
+
+    tile_list = get_tile_list(1000, 300, 50)
+    assert [each[2:] for each in tile_list] == [
+        (0, 300),
+        (300, 600),
+        (600, 900),
+        (900, 1000),
+    ]
+    assert tile_list[1][:2] == (250, 650)
+    assert tile_list[-1][:2] == (850, 1000)
+
+    class _WordBlock(object):
+        def __init__(self, y: int):
+            self.box = {"x": 0, "y": y, "w": 10, "h": 20}
+            self.location = None
+
+        def update_box(self, box: dict):
+            self.location = [(box["x"], box["y"]), (box["x"] + 10, box["y"] + 20)]
+
+    # a word (290 - 310) in the overlapping rows of tile 0 and tile 1
+    merged = merge_tile_result(tile_list[:2], [[_WordBlock(290)], [_WordBlock(40)]])
+    assert len(merged) == 1
+    assert merged[0].box["y"] == 290
+    assert merged[0].location[0] == (0, 290)
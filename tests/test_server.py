@@ -23,6 +23,7 @@ def life_time():
         "sample/pics",
         "--port",
         str(PORT),
+        "--metrics",
     ]
     server_process = subprocess.Popen(start_cmd)
     time.sleep(5)
@@ -67,3 +68,113 @@ def test_analyse_with_extras():
 def test_analyse_without_template():
     result = find_it_client.analyse_with_path(TARGET_PATH, None, engine=["ocr"])
     assert result.ocr_engine.data
+
+
+def test_templates():
+    import requests
+
+    resp = requests.get(f"{find_it_client.url}/templates").json()
+    name_list = [each["name"] for each in resp["response"]["templates"]]
+    assert TEMPLATE_NAME in name_list
+
+
+def test_metrics():
+    import requests
+
+    # timing is recorded for metrics, but returned only if client asks for it
+    result = find_it_client.analyse_with_path(TARGET_PATH, TEMPLATE_NAME)
+    assert "timing" not in result.response
+    assert "load_path" not in result.response
+    result = find_it_client.analyse_with_path(TARGET_PATH, TEMPLATE_NAME, timing=True)
+    assert "timing" in result.response
+    resp = requests.get(f"{find_it_client.url}/metrics")
+    assert resp.ok
+    assert 'findit_requests_total{status="OK"}' in resp.text
+    assert 'stage="match",template="wechat_logo.png"' in resp.text
+
+
+def test_findit_pool(monkeypatch):
+    import tempfile
+    from findit import toolbox
+    from findit.server import utils
+
+    def _no_temp_file(*_, **__):
+        raise AssertionError("upload should be decoded in memory")
+
+    monkeypatch.setattr(tempfile, "mkstemp", _no_temp_file)
+    monkeypatch.setattr(tempfile, "NamedTemporaryFile", _no_temp_file)
+
+    utils.init_registry("sample/pics")
+    with open(TARGET_PATH, "rb") as f:
+        target_pic_bytes = f.read()
+    extra_dict = {"engine": ["template"], "timing": True}
+    pool_size = len(utils._findit_pool)
+    response_list = [
+        utils.analyse([TEMPLATE_NAME], target_pic_bytes, dict(extra_dict), time.time())
+        for _ in range(2)
+    ]
+    # one findit for one init config
+    assert len(utils._findit_pool) == pool_size + 1
+    assert utils.get_findit(extra_dict) is utils.get_findit(dict(extra_dict))
+    assert utils.get_findit(extra_dict) is not utils.get_findit({"engine": ["feature"]})
+
+    for each in response_list:
+        assert each["load_path"] == toolbox.LOAD_PATH_IMDECODE
+        assert each["data"][TEMPLATE_NAME]["TemplateEngine"]["ok"]
+    assert response_list[0]["data"] == response_list[1]["data"]
+
+
+@pytest.fixture()
+def busy_server_url():
+    # only one request in workers
+    port = PORT + 1
+    server_process = subprocess.Popen(
+        [
+            "python",
+            "-m",
+            "findit.server",
+            "--dir",
+            "sample/pics",
+            "--port",
+            str(port),
+            "--worker",
+            "1",
+            "--queue",
+            "1",
+        ]
+    )
+    time.sleep(5)
+    yield f"http://127.0.0.1:{port}"
+    server_process.terminate()
+    server_process.wait()
+
+
+def test_server_busy(busy_server_url):
+    import json
+    import requests
+    import concurrent.futures
+
+    def _analyse(_):
+        with open(TARGET_PATH, "rb") as f:
+            return requests.post(
+                f"{busy_server_url}/analyse",
+                data={
+                    "template_name": TEMPLATE_NAME,
+                    # slow, for keeping the worker busy
+                    "extras": json.dumps({"engine_template_scale": [1, 4, 200]}),
+                },
+                files={"file": f},
+            )
+
+    with concurrent.futures.ThreadPoolExecutor(4) as executor:
+        resp_list = list(executor.map(_analyse, range(4)))
+
+    ok_list = [each for each in resp_list if each.status_code == 200]
+    busy_list = [each for each in resp_list if each.status_code == 503]
+    assert ok_list and busy_list
+    assert len(ok_list) + len(busy_list) == len(resp_list)
+    for each in ok_list:
+        assert "queue_wait" in each.json()["response"]
+    for each in busy_list:
+        assert each.json()["status"] == "SERVER_BUSY"
+        assert each.headers["Retry-After"]